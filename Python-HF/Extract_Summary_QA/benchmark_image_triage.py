@@ -0,0 +1,84 @@
+import argparse
+import time
+from collections import Counter
+
+from pdf_extraction import iter_pages, ImageDeduplicator
+from image_triage import triage_image, triage_settings
+from ocr_pool import ocr_image_text
+
+# Measures how many of a PDF's unique images triage skips, what triage costs,
+# and (with --ocr) the Tesseract time it saves. --show-skipped implies --ocr and
+# prints any text Tesseract found in skipped images.
+
+
+def load_unique_images(pdf_path):
+    deduplicator = ImageDeduplicator()
+    images = []
+    occurrences = 0
+    for record in iter_pages(pdf_path):
+        for ref in record.images:
+            key, info, is_new = deduplicator.resolve(ref)
+            if key is None:
+                continue
+            occurrences += 1
+            if is_new:
+                images.append(info)
+    return images, occurrences
+
+
+def time_ocr(images):
+    texts = []
+    start = time.time()
+    for info in images:
+        texts.append(ocr_image_text(info['image']))
+    return texts, time.time() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark image triage before OCR/BLIP")
+    parser.add_argument("--pdf", default="thesis.pdf")
+    parser.add_argument("--ocr", action="store_true", help="also time Tesseract on kept and skipped images")
+    parser.add_argument("--show-skipped", action="store_true", help="print OCR text found in skipped images (implies --ocr)")
+    args = parser.parse_args()
+    args.ocr = args.ocr or args.show_skipped
+
+    images, occurrences = load_unique_images(args.pdf)
+    if not images:
+        raise SystemExit(f"No images extracted from {args.pdf}")
+    print(f"{args.pdf}: {occurrences} image occurrences, {len(images)} unique images")
+    print(f"Thresholds: {triage_settings()}")
+
+    kept, skipped = [], []
+    reasons = Counter()
+    start = time.time()
+    for info in images:
+        keep, reason, features = triage_image(info['image'])
+        if keep:
+            kept.append(info)
+        else:
+            skipped.append((info, reason, features))
+            reasons[reason] += 1
+    triage_seconds = time.time() - start
+
+    print("\n" + "=" * 60)
+    print(f"Kept {len(kept)}, skipped {len(skipped)} ({len(skipped) / len(images):.0%})")
+    for reason, count in reasons.most_common():
+        print(f"  {reason:<20} {count:>5}")
+    print(f"Triage: {triage_seconds:.3f}s total, {1000 * triage_seconds / len(images):.2f} ms/image")
+
+    if args.ocr:
+        _, kept_seconds = time_ocr(kept)
+        skipped_texts, skipped_seconds = time_ocr([info for info, _, _ in skipped])
+        print("=" * 60)
+        print(f"OCR kept images:    {kept_seconds:.2f}s")
+        print(f"OCR skipped images: {skipped_seconds:.2f}s saved "
+              f"({skipped_seconds / max(triage_seconds, 1e-9):.0f}x the triage cost)")
+        with_text = [(entry, text) for entry, text in zip(skipped, skipped_texts) if text]
+        print(f"Skipped images where Tesseract found text: {len(with_text)}")
+        if args.show_skipped:
+            for (info, reason, features), text in with_text:
+                print(f"  page {info['page']} #{info['index']} {info['size']} {reason}: {text[:80]!r}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+import argparse
+import re
+import time
+
+import torch
+
+from model_registry import ModelRegistry
+from pdf_extraction import iter_pages, join_page_text, ImageDeduplicator
+from chunking import chunk_by_tokens
+
+# Compares fp32 and int8 (dynamic quantization) latency and output quality on CPU.
+# Quality is reported as token-overlap F1 of the int8 output against fp32.
+
+
+def load_pdf(pdf_path, max_images):
+    """Document text and up to max_images unique images, extracted as the service does"""
+    page_texts = []
+    images = []
+    deduplicator = ImageDeduplicator()
+    for record in iter_pages(pdf_path, with_images=max_images > 0):
+        page_texts.append(record.text)
+        for ref in record.images:
+            if len(images) >= max_images:
+                break
+            _, info, is_new = deduplicator.resolve(ref)
+            if is_new:
+                images.append(info['image'].convert('RGB'))
+    return re.sub(r'\s+', ' ', join_page_text(page_texts)).strip(), images
+
+
+def token_f1(candidate, reference):
+    cand = candidate.lower().split()
+    ref = reference.lower().split()
+    if not cand or not ref:
+        return 0.0
+    common = sum(min(cand.count(t), ref.count(t)) for t in set(cand))
+    if common == 0:
+        return 0.0
+    precision = common / len(cand)
+    recall = common / len(ref)
+    return 2 * precision * recall / (precision + recall)
+
+
+def run_summaries(bundle, chunks):
+    outputs = []
+    start = time.time()
+    for chunk in chunks:
+        result = bundle.summarizer(chunk, max_length=150, min_length=30, do_sample=False, truncation=True)
+        outputs.append(result[0]['summary_text'])
+    return outputs, time.time() - start
+
+
+def run_captions(bundle, images):
+    outputs = []
+    start = time.time()
+    for image in images:
+        inputs = bundle.processor(image, return_tensors="pt").to(bundle.device)
+        with torch.no_grad():
+            out = bundle.model.generate(**inputs, max_length=100, num_beams=5)
+        outputs.append(bundle.processor.decode(out[0], skip_special_tokens=True))
+    return outputs, time.time() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark fp32 vs int8 inference")
+    parser.add_argument("--pdf", default="thesis.pdf")
+    parser.add_argument("--model", default="t5-small")
+    parser.add_argument("--chunks", type=int, default=8)
+    parser.add_argument("--overlap-tokens", type=int, default=64, help="as SUMMARY_CHUNK_OVERLAP_TOKENS")
+    parser.add_argument("--images", type=int, default=4)
+    parser.add_argument("--skip-blip", action="store_true")
+    args = parser.parse_args()
+
+    text, images = load_pdf(args.pdf, 0 if args.skip_blip else args.images)
+    if not text:
+        raise SystemExit(f"No text extracted from {args.pdf}")
+
+    # Chunked in model tokens like the summarizer's map stage; the tokenizer is the same at both precisions
+    registry = ModelRegistry(memory_budget_mb=0)
+    tokenizer = registry.get_seq2seq(args.model, "fp32").tokenizer
+    chunks = chunk_by_tokens(text, tokenizer, overlap_tokens=args.overlap_tokens)[:args.chunks]
+    print(f"{args.pdf}: {len(text)} characters, {len(chunks)} chunks, {len(images)} images")
+
+    results = {}
+    for precision in ("fp32", "int8"):
+        bundle = registry.get_seq2seq(args.model, precision)
+        registry.warm_up_seq2seq(bundle)
+        summaries, seconds = run_summaries(bundle, chunks)
+        results[precision] = {"summaries": summaries, "seconds": seconds}
+
+        if images:
+            blip = registry.get_blip(precision)
+            captions, caption_seconds = run_captions(blip, images)
+            results[precision].update({"captions": captions, "caption_seconds": caption_seconds})
+
+    print("\n" + "=" * 60)
+    for entry in registry.stats()["models"]:
+        print(f"{entry['model_name']:<45} {entry['precision']:<5} {entry['size_mb']:>8.1f} MB")
+
+    print("=" * 60)
+    fp32, int8 = results["fp32"], results["int8"]
+    print(f"Summaries  fp32: {fp32['seconds']:.2f}s  int8: {int8['seconds']:.2f}s  "
+          f"speedup: {fp32['seconds'] / max(int8['seconds'], 1e-9):.2f}x")
+    f1 = [token_f1(q, r) for q, r in zip(int8["summaries"], fp32["summaries"])]
+    print(f"Summary token F1 vs fp32: mean {sum(f1) / len(f1):.3f}, min {min(f1):.3f}")
+
+    if images:
+        print(f"Captions   fp32: {fp32['caption_seconds']:.2f}s  int8: {int8['caption_seconds']:.2f}s  "
+              f"speedup: {fp32['caption_seconds'] / max(int8['caption_seconds'], 1e-9):.2f}x")
+        f1 = [token_f1(q, r) for q, r in zip(int8["captions"], fp32["captions"])]
+        print(f"Caption token F1 vs fp32: mean {sum(f1) / len(f1):.3f}, min {min(f1):.3f}")
+
+
+if __name__ == "__main__":
+    main()
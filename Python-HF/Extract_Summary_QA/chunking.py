@@ -0,0 +1,104 @@
+import re
+import hashlib
+
+from nltk.tokenize import sent_tokenize
+
+# Tokenizers without a real limit report a huge sentinel for model_max_length
+DEFAULT_MAX_INPUT_TOKENS = 512
+UNBOUNDED_MAX_LENGTH = 100000
+
+# Content-defined boundaries: roughly one sentence in ANCHOR_EVERY is an anchor,
+# and a chunk may close on an anchor once it is MIN_ANCHOR_FILL of the budget
+ANCHOR_EVERY = 4
+MIN_ANCHOR_FILL = 0.75
+
+
+def split_sentences(text):
+    """Split text into sentences, falling back to punctuation when punkt is missing"""
+    try:
+        sentences = sent_tokenize(text)
+    except LookupError:
+        sentences = re.split(r'(?<=[.!?])\s+', text)
+    return [s.strip() for s in sentences if s.strip()]
+
+
+def model_input_limit(tokenizer, default=DEFAULT_MAX_INPUT_TOKENS):
+    """Maximum number of input tokens the tokenizer's model accepts"""
+    limit = getattr(tokenizer, 'model_max_length', None)
+    if not limit or limit > UNBOUNDED_MAX_LENGTH:
+        return default
+    return limit
+
+
+def count_tokens(tokenizer, texts):
+    """Token counts (without special tokens) for a list of texts in one tokenizer call"""
+    if not texts:
+        return []
+    encoded = tokenizer(list(texts), add_special_tokens=False)["input_ids"]
+    return [len(ids) for ids in encoded]
+
+
+def _is_anchor(sentence):
+    """Deterministic, content-based choice of sentences that may end a chunk"""
+    return hashlib.md5(sentence.encode()).digest()[0] % ANCHOR_EVERY == 0
+
+
+def chunk_by_tokens(text, tokenizer, max_tokens=None, overlap_tokens=0, reserve_tokens=16, content_defined=False):
+    """Split text into chunks measured in real model tokens.
+
+    Each chunk is filled with whole sentences up to max_tokens (the model's
+    input limit by default) minus reserve_tokens, which leaves room for task
+    prefixes such as "summarize: " and special tokens. Consecutive chunks
+    share up to overlap_tokens worth of trailing sentences. A single sentence
+    longer than the budget is split on token boundaries.
+
+    With content_defined=True a chunk also closes after an anchor sentence
+    once it is mostly full, so boundaries depend on nearby content only and an
+    edit to one part of a document leaves later chunks unchanged.
+    """
+    budget = (max_tokens or model_input_limit(tokenizer)) - reserve_tokens
+    if budget <= 0:
+        raise ValueError(f"Chunk budget must be positive (max_tokens={max_tokens}, reserve_tokens={reserve_tokens})")
+
+    sentences = split_sentences(text)
+    if not sentences:
+        return []
+    encoded = tokenizer(sentences, add_special_tokens=False)["input_ids"]
+
+    # Break up sentences that cannot fit in a chunk on their own
+    pieces = []
+    for sentence, ids in zip(sentences, encoded):
+        if len(ids) <= budget:
+            pieces.append((sentence, len(ids)))
+            continue
+        for start in range(0, len(ids), budget):
+            window = ids[start:start + budget]
+            pieces.append((tokenizer.decode(window, skip_special_tokens=True), len(window)))
+
+    chunks = []
+    current = []
+    current_tokens = 0
+    for piece, n_tokens in pieces:
+        anchored = (content_defined and current and current_tokens >= budget * MIN_ANCHOR_FILL
+                    and _is_anchor(current[-1][0]))
+        if current and (current_tokens + n_tokens > budget or anchored):
+            chunks.append(" ".join(p for p, _ in current))
+
+            # Carry trailing sentences forward as overlap
+            carried = []
+            carried_tokens = 0
+            for prev, prev_tokens in reversed(current):
+                if carried_tokens + prev_tokens > overlap_tokens or carried_tokens + prev_tokens + n_tokens > budget:
+                    break
+                carried.insert(0, (prev, prev_tokens))
+                carried_tokens += prev_tokens
+            current = carried
+            current_tokens = carried_tokens
+
+        current.append((piece, n_tokens))
+        current_tokens += n_tokens
+
+    if current:
+        chunks.append(" ".join(p for p, _ in current))
+
+    return chunks
@@ -0,0 +1,177 @@
+import os
+import json
+import time
+import shutil
+import threading
+
+import numpy as np
+
+# --- 1. Configuration ---
+
+EMBEDDING_STORE_DIR = os.getenv("EMBEDDING_STORE_DIR", "/app/.cache/embeddings")
+EMBEDDING_STORE_MAX_MB = int(os.getenv("EMBEDDING_STORE_MAX_MB", 1024))
+
+MANIFEST_NAME = "manifest.json"
+# Fixed-width arrays of one stored document; passages.bin holds UTF-8 passage text sliced by offsets
+ARRAY_FILES = {
+    "embeddings": ("embeddings.f16", np.float16),
+    "token_counts": ("token_counts.i32", np.int32),
+    "offsets": ("offsets.i64", np.int64),
+    "passages": ("passages.bin", np.uint8),
+}
+
+
+class StoredPassages:
+    """Passages, token counts and embeddings of one document read back from the store"""
+
+    def __init__(self, passages, token_counts, embeddings, manifest):
+        self.passages = passages
+        self.token_counts = token_counts
+        self.embeddings = embeddings
+        self.manifest = manifest
+
+
+# --- 2. Store ---
+
+class EmbeddingStore:
+    """On-disk passage embeddings, one directory per key under EMBEDDING_STORE_DIR.
+
+    Unencrypted embeddings are read with np.memmap, so vectors are paged in
+    lazily and never copied; the small passage, offset and token-count arrays
+    are copied into memory. With an encryption password each array file is
+    Fernet-encrypted and decrypted into memory on load; an entry written under
+    another password counts as a miss. Callers without a SecureFileHandler
+    get no disk tier, as with the result cache.
+    """
+
+    def __init__(self, directory=EMBEDDING_STORE_DIR, max_mb=EMBEDDING_STORE_MAX_MB):
+        self.directory = directory
+        self.max_bytes = max_mb * 1024 * 1024
+        self._lock = threading.Lock()
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+        except Exception as e:
+            print(f"Warning: Embedding store directory unavailable ({e}), embeddings are not persisted")
+            self.directory = None
+
+    def load(self, key, secure_handler=None, embedding_model=None):
+        """StoredPassages for key, or None when missing, unreadable or from another model"""
+        if not self.directory or secure_handler is None:
+            return None
+        entry_dir = os.path.join(self.directory, key)
+        manifest_path = os.path.join(entry_dir, MANIFEST_NAME)
+        if not os.path.exists(manifest_path):
+            return None
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            if embedding_model is not None and manifest.get("embedding_model") != embedding_model:
+                return None
+
+            arrays = {}
+            for name, (filename, dtype) in ARRAY_FILES.items():
+                shape = tuple(manifest["shapes"][name])
+                path = os.path.join(entry_dir, filename)
+                if manifest.get("encrypted"):
+                    if not secure_handler.fernet:
+                        return None
+                    with open(path + '.enc', 'rb') as f:
+                        raw = secure_handler.fernet.decrypt(f.read())
+                    arrays[name] = np.frombuffer(raw, dtype=dtype).reshape(shape)
+                elif 0 in shape:
+                    arrays[name] = np.zeros(shape, dtype=dtype)
+                elif name == "embeddings":
+                    arrays[name] = np.memmap(path, dtype=dtype, mode='r', shape=shape)
+                else:
+                    arrays[name] = np.fromfile(path, dtype=dtype).reshape(shape)
+        except Exception as e:
+            # Written under a different password, or incomplete
+            print(f"Embedding store entry {key[:12]} unreadable: {e}")
+            return None
+
+        blob = arrays["passages"]
+        offsets = arrays["offsets"]
+        passages = [bytes(blob[offsets[i]:offsets[i + 1]]).decode('utf-8') for i in range(len(offsets) - 1)]
+        os.utime(manifest_path)  # LRU order follows last access
+        return StoredPassages(passages, arrays["token_counts"], arrays["embeddings"], manifest)
+
+    def save(self, key, passages, token_counts, embeddings, secure_handler=None, **manifest_fields):
+        """Write one document's passages and embeddings; no-op without a disk tier"""
+        if not self.directory or secure_handler is None:
+            return
+        encoded = [p.encode('utf-8') for p in passages]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(e) for e in encoded])
+        arrays = {
+            "embeddings": np.ascontiguousarray(embeddings, dtype=np.float16),
+            "token_counts": np.asarray(token_counts, dtype=np.int32),
+            "offsets": offsets,
+            "passages": np.frombuffer(b"".join(encoded), dtype=np.uint8),
+        }
+        encrypted = bool(secure_handler.fernet)
+        manifest = {
+            **manifest_fields,
+            "passages": len(passages),
+            "dim": int(arrays["embeddings"].shape[1]) if arrays["embeddings"].ndim == 2 else 0,
+            "encrypted": encrypted,
+            "created": time.time(),
+            "shapes": {name: list(array.shape) for name, array in arrays.items()}
+        }
+
+        entry_dir = os.path.join(self.directory, key)
+        staging_dir = f"{entry_dir}.tmp{os.getpid()}.{threading.get_ident()}"
+        try:
+            os.makedirs(staging_dir, exist_ok=True)
+            for name, (filename, _) in ARRAY_FILES.items():
+                path = os.path.join(staging_dir, filename)
+                if encrypted:
+                    with open(path + '.enc', 'wb') as f:
+                        f.write(secure_handler.fernet.encrypt(arrays[name].tobytes()))
+                else:
+                    arrays[name].tofile(path)
+            # Manifest last: an entry without one is never read
+            with open(os.path.join(staging_dir, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+                json.dump(manifest, f)
+            with self._lock:
+                if os.path.exists(entry_dir):
+                    shutil.rmtree(entry_dir, ignore_errors=True)
+                os.replace(staging_dir, entry_dir)
+        except Exception as e:
+            print(f"Warning: Could not persist embeddings: {e}")
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            return
+        self._enforce_budget(secure_handler)
+
+    def _enforce_budget(self, secure_handler):
+        """Delete least recently used entries beyond EMBEDDING_STORE_MAX_MB.
+
+        The memory-mapped embeddings file may still back a live retrieval
+        index, so it is unlinked without being overwritten: open mappings
+        keep reading the old vectors until they are released. Every other
+        file (passage text included) is securely deleted.
+        """
+        try:
+            entries = []
+            for name in os.listdir(self.directory):
+                entry_dir = os.path.join(self.directory, name)
+                manifest_path = os.path.join(entry_dir, MANIFEST_NAME)
+                if not os.path.exists(manifest_path):
+                    continue
+                size = sum(os.path.getsize(os.path.join(entry_dir, f)) for f in os.listdir(entry_dir))
+                entries.append((os.path.getmtime(manifest_path), size, entry_dir))
+
+            total = sum(size for _, size, _ in entries)
+            for _, size, entry_dir in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                mapped = ARRAY_FILES["embeddings"][0]
+                for filename in os.listdir(entry_dir):
+                    if filename != mapped:
+                        secure_handler.secure_delete(os.path.join(entry_dir, filename))
+                shutil.rmtree(entry_dir, ignore_errors=True)
+                total -= size
+        except Exception as e:
+            print(f"Warning: Embedding store eviction failed: {e}")
+
+
+embedding_store = EmbeddingStore()
@@ -82,11 +82,8 @@ import string
 from datetime import datetime, timedelta
 import json
 import torch
-from transformers import T5ForConditionalGeneration, T5Tokenizer, pipeline, BlipProcessor, BlipForConditionalGeneration, AutoTokenizer, AutoModelForSeq2SeqLM
+from transformers import T5ForConditionalGeneration, T5Tokenizer
 import warnings
-import fitz  # PyMuPDF
-from PIL import Image, ImageEnhance, ImageFilter
-import io
 import base64
 import os
 import pytesseract
@@ -95,10 +92,12 @@ import logging
 import getpass
 import tempfile
 import shutil
-import numpy as np
 import requests
 import urllib3
+import threading
+import queue
 from fastapi import FastAPI, UploadFile, File, Form
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 try:
     import psycopg2
@@ -112,23 +111,96 @@ from typing import List, Dict, Any, Optional
 from cryptography.fernet import Fernet
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
-try:
-    import cv2
-    import numpy as np
-    OPENCV_AVAILABLE = True
-except ImportError:
-   # print("OpenCV not available. Using PIL for image preprocessing.")
-    from PIL import Image
-    OPENCV_AVAILABLE = False
-    
-from questions import THESIS_QUESTIONS
+# Resolved lazily the first time a request enables OCR
+TESSERACT_AVAILABLE = None
+
+# Number of chunks sent through the summarizer per padded generate call
+SUMMARY_BATCH_SIZE = int(os.getenv("SUMMARY_BATCH_SIZE", 8))
+# Token overlap between consecutive chunks, and tokens left free for the task prefix
+SUMMARY_CHUNK_OVERLAP_TOKENS = int(os.getenv("SUMMARY_CHUNK_OVERLAP_TOKENS", 64))
+SUMMARY_CHUNK_RESERVE_TOKENS = int(os.getenv("SUMMARY_CHUNK_RESERVE_TOKENS", 16))
+# Token budget for extractive pre-selection before the map stage (0 = summarize every chunk)
+SUMMARY_TOKEN_BUDGET = int(os.getenv("SUMMARY_TOKEN_BUDGET", 0))
+# Tree reduce: summaries merged per reduce call, and maximum number of reduce levels
+SUMMARY_REDUCE_FAN_IN = int(os.getenv("SUMMARY_REDUCE_FAN_IN", 3))
+SUMMARY_MAX_DEPTH = int(os.getenv("SUMMARY_MAX_DEPTH", 3))
+# Reuse map-stage summaries of unchanged chunks across uploads (content-defined chunk boundaries).
+# Opt-in: content-defined boundaries produce more, smaller chunks than token packing, so a
+# first-time summary costs more generate calls in exchange for cheap re-summarization
+SUMMARY_CHUNK_MEMO = os.getenv("SUMMARY_CHUNK_MEMO", "false").lower() in ("1", "true", "yes")
+# 'recursive' summarizes the whole document; 'sections' summarizes each detected section on its own
+SUMMARY_MODES = ("recursive", "sections")
+SUMMARY_MODE = os.getenv("SUMMARY_MODE", "recursive")
+# Tokens of each section that are summarized in 'sections' mode (most salient chunks first)
+SUMMARY_SECTION_TOKEN_BUDGET = int(os.getenv("SUMMARY_SECTION_TOKEN_BUDGET", 1024))
+# Tokens of a Q&A prompt kept free for the "question: ... context:" template and special tokens
+# (each question's own tokens are subtracted from its context budget as well)
+QA_PROMPT_RESERVE_TOKENS = int(os.getenv("QA_PROMPT_RESERVE_TOKENS", 16))
+# Questions per padded Q&A generate call (larger batches trade memory for throughput)
+QA_BATCH_SIZE = int(os.getenv("QA_BATCH_SIZE", 8))
+# 'generative' answers with the seq2seq model; 'extractive' returns the best-matching span (fast)
+QA_MODES = ("generative", "extractive")
+QA_MODE = os.getenv("QA_MODE", "generative")
+
+from model_registry import model_registry, get_device, resolve_precision, MODEL_CONFIGS, PRELOAD_MODELS, EMBEDDING_MODEL_NAME
+from chunking import chunk_by_tokens, count_tokens, model_input_limit
+from salience import select_salient_chunks
+from summary_workers import get_pool as get_summary_pool, summarize_batches, shutdown_pools
+from result_cache import result_cache, make_cache_key, RESULT_CACHE_ENABLED, ResultCache
+from latency_budget import Deadline, plan_latency_budget
+from retrieval import (get_index as get_retrieval_index, prepare_question_set, load_embedder, embed_texts,
+                       RETRIEVAL_PASSAGE_TOKENS, RETRIEVAL_TOP_K, RETRIEVAL_BM25_WEIGHT)
+from span_qa import answer_spans, SPAN_QA_LEXICAL_WEIGHT
+from question_sets import question_set_registry
 from biomed_annotator import generate_annotations
+from pdf_extraction import iter_pages, join_page_text, ImageDeduplicator, shutdown_pool as shutdown_extraction_pool
+from image_triage import TriageStats, triage_settings
+from ocr_pool import OCR_BATCH_IMAGES, shutdown_pool as shutdown_ocr_pool
+from image_artifacts import ocr_with_cache, get_caption, put_caption, BLIP_GENERATION
+
+# Map-stage outputs keyed by chunk text hash, model and generation parameters
+chunk_summary_cache = ResultCache("chunk_summaries")
+
+# Greedy decoding for the final summary and answers instead of sampling. On by default whenever
+# the result cache is, so a cached report holds the same text a cache miss would produce
+DETERMINISTIC_GENERATION = os.getenv("DETERMINISTIC_GENERATION", str(RESULT_CACHE_ENABLED)).lower() in ("1", "true", "yes")
 
 warnings.filterwarnings('ignore')
 
 app = FastAPI(title='AI (PDF→Summary+QnA+Scores)', version='0.2.1')
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
+def _preload():
+    model_registry.preload(PRELOAD_MODELS)
+    try:
+        prepare_question_set(question_set_registry.resolve())
+    except Exception as e:
+        print(f"Embedding the default question set failed: {e}")
+
+@app.on_event("startup")
+def preload_models():
+    """Load and warm up PRELOAD_MODELS in the background; /ready reports when done"""
+    threading.Thread(target=_preload, daemon=True).start()
+
+@app.on_event("shutdown")
+def stop_workers():
+    shutdown_pools()
+    shutdown_extraction_pool()
+    shutdown_ocr_pool()
+
+@app.get('/ready')
+def ready():
+    """Readiness probe: unhealthy until every PRELOAD_MODELS entry is loaded and warmed up.
+    A replica whose preload failed or fell back to another model stays unready ('degraded')."""
+    status = {
+        "preload": model_registry.preload_status,
+        "models": model_registry.stats()
+    }
+    if not model_registry.is_ready():
+        state = "degraded" if model_registry.preload_finished() else "warming_up"
+        return JSONResponse(status_code=503, content={"status": state, **status})
+    return {"status": "ready", **status}
+
 class HIPAALogger:
     """HIPAA-compliant audit logging system"""
     
@@ -298,27 +370,46 @@ class SecureFileHandler:
 class HIPAACompliantThesisAnalyzer:
     """HIPAA-compliant version of the thesis analyzer"""
     
-    def __init__(self, user_id=None, password=None, session_timeout=30, model_name="t5-small", mode="analyze"):
+    def __init__(self, user_id=None, password=None, session_timeout=30, model_name="t5-small", mode="analyze",
+                 use_ocr=False, use_blip=False, precision=None, summary_token_budget=None, max_latency_ms=None,
+                 summary_mode=None, qa_mode=None, deterministic=None):
         self.user_id = user_id or getpass.getuser()
         self.session_timeout = session_timeout  # minutes
         self.session_start = datetime.now()
         self.last_activity = datetime.now()
         self.model_name = model_name
         self.mode = mode
+        self.use_ocr = use_ocr
+        self.use_blip = use_blip
+        self.precision = precision  # None = deployment default (INFERENCE_PRECISION)
+        self.summary_token_budget = SUMMARY_TOKEN_BUDGET if summary_token_budget is None else summary_token_budget
+        self.summary_mode = summary_mode or SUMMARY_MODE
+        if self.summary_mode not in SUMMARY_MODES:
+            print(f"Unknown summary mode '{self.summary_mode}', using 'recursive'")
+            self.summary_mode = "recursive"
+        self.qa_mode = qa_mode or QA_MODE
+        if self.qa_mode not in QA_MODES:
+            print(f"Unknown Q&A mode '{self.qa_mode}', using 'generative'")
+            self.qa_mode = "generative"
+        self.summary_stats = {}
+        self.section_summaries = {}
+        self.progress_callback = None  # receives progress events for streaming endpoints
+        # Sampled reports are never cached, see _lookup_result
+        self.deterministic = DETERMINISTIC_GENERATION if deterministic is None else deterministic
+        self._downloads = {}  # url -> (temporary file, document hash)
+        self._doc_hashes = {}
+        
+        # Latency budget: the deadline starts with the request, before model loading
+        self.deadline = Deadline(max_latency_ms) if max_latency_ms else None
+        self.latency_plan = plan_latency_budget(max_latency_ms, model_name) if max_latency_ms else None
+        self.incomplete_stages = []
+        if self.latency_plan is not None:
+            self.model_name = self.latency_plan["model_name"]
+            # The plan decodes greedily, so its reports are deterministic (and cacheable)
+            self.deterministic = True
         
         # Map model names to their optimal tasks and parameters
-        self.model_configs = {
-            "t5-small": {"task": "text2text-generation", "summarizer_task": "summarization"},
-            "t5-base": {"task": "text2text-generation", "summarizer_task": "summarization"},
-            "t5-large": {"task": "text2text-generation", "summarizer_task": "summarization"},
-            "bart-large-cnn": {"task": "text2text-generation", "summarizer_task": "summarization"},
-            "facebook/bart-base": {"task": "text2text-generation", "summarizer_task": "summarization"},
-            "distilbart-cnn-12-6": {"task": "text2text-generation", "summarizer_task": "summarization"},
-            "sshleifer/distilbart-cnn-6-6": {"task": "text2text-generation", "summarizer_task": "summarization"},
-            "pegasus-large": {"task": "text2text-generation", "summarizer_task": "summarization"},
-            "flan-t5-base": {"task": "text2text-generation", "summarizer_task": "summarization"},
-            "flan-t5-large": {"task": "text2text-generation", "summarizer_task": "summarization"}
-        }
+        self.model_configs = MODEL_CONFIGS
         
         # Initialize HIPAA compliance components
         self.hipaa_logger = HIPAALogger()
@@ -363,89 +454,47 @@ class HIPAACompliantThesisAnalyzer:
         self.extracted_images = []
         self.image_descriptions = []
         self.ocr_results = []
-        self.use_ocr = True
-        self.use_blip = True
+        self.image_triage = TriageStats()
 
-        # Initialize Model
-        print(f"Loading {self.model_name} model (HIPAA-compliant local processing)...")
-        self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
-        
-        try:
-            # Try to load with explicit cache directory
-            cache_dir = '/app/.cache/huggingface'
-            self.tokenizer = AutoTokenizer.from_pretrained(self.model_name, cache_dir=cache_dir)
-            self.model = AutoModelForSeq2SeqLM.from_pretrained(self.model_name, cache_dir=cache_dir)
-            self.model.to(self.device)
-            print(f"{self.model_name} loaded successfully from cache")
-        except Exception as e:
-            print(f"Error loading {self.model_name}: {e}")
-            print("Attempting to load with fallback cache directory...")
-            try:
-                # Fallback to default cache
-                self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
-                self.model = AutoModelForSeq2SeqLM.from_pretrained(self.model_name)
-                self.model.to(self.device)
-                print(f"{self.model_name} loaded with fallback cache")
-            except Exception as e2:
-                print(f"Failed to load {self.model_name}: {e2}")
-                # Fallback to t5-small if requested model fails
-                if self.model_name != "t5-small":
-                    print("Falling back to t5-small...")
-                    self.model_name = "t5-small"
-                    self.tokenizer = AutoTokenizer.from_pretrained("t5-small")
-                    self.model = AutoModelForSeq2SeqLM.from_pretrained("t5-small")
-                    self.model.to(self.device)
-                else:
-                    raise e2
+        # Models are shared process-wide through the registry
+        self.device = get_device()
+        bundle = model_registry.get_seq2seq(self.model_name, self.precision)
+        self.model_name = bundle.model_name
+        self.precision = bundle.precision
+        self.backend = bundle.backend
+        self.model = bundle.model
+        # Private tokenizer and pipelines: the shared tokenizer is not safe across request threads
+        self.tokenizer, self.summarizer, self.qa_pipeline = bundle.for_request()
 
-        # Initialize pipelines
-        try:
-            self.summarizer = pipeline(
-                "summarization",
-                model=self.model,
-                tokenizer=self.tokenizer,
-                device=0 if torch.cuda.is_available() else -1,
-                max_length=200,
-                min_length=50,
-                do_sample=True,
-                temperature=0.7
-            )
+        # BLIP and Tesseract are only loaded when a request asks for them
+        self.blip_processor = None
+        self.blip_model = None
 
-            self.qa_pipeline = pipeline(
-                "text2text-generation",
-                model=self.model,
-                tokenizer=self.tokenizer,
-                device=0 if torch.cuda.is_available() else -1,
-                max_length=512,
-                do_sample=True,
-                temperature=0.7
-            )
-            print("Pipelines initialized successfully")
+    def _ensure_blip(self):
+        """Load BLIP on first use; returns False if it is unavailable"""
+        if self.blip_model is not None:
+            return True
+        try:
+            blip = model_registry.get_blip(self.precision)
+            self.blip_processor = blip.processor
+            self.blip_model = blip.model
+            return True
         except Exception as e:
-            print(f"Error initializing pipelines: {e}")
-            # Create fallback pipelines
-            self.summarizer = None
-            self.qa_pipeline = None
-
-        # Initialize BLIP if enabled
-        if self.use_blip:
-            try:
-                self.blip_processor = BlipProcessor.from_pretrained("Salesforce/blip-image-captioning-base")
-                self.blip_model = BlipForConditionalGeneration.from_pretrained("Salesforce/blip-image-captioning-base")
-                self.blip_model.to(self.device)
-                print("BLIP model loaded for local image analysis")
-            except Exception as e:
-                print(f"BLIP model loading failed: {e}")
-                self.use_blip = False
+            print(f"BLIP model loading failed: {e}")
+            return False
 
-        # Check OCR availability
-        if self.use_ocr:
+    def _ensure_ocr(self):
+        """Check Tesseract availability once per process"""
+        global TESSERACT_AVAILABLE
+        if TESSERACT_AVAILABLE is None:
             try:
                 pytesseract.get_tesseract_version()
                 print("Tesseract OCR available for local processing")
+                TESSERACT_AVAILABLE = True
             except Exception as e:
                 print(f"Tesseract OCR not available: {e}")
-                self.use_ocr = False
+                TESSERACT_AVAILABLE = False
+        return TESSERACT_AVAILABLE
     
     def _download_nltk_resources(self):
         """Download required NLTK resources to user directory"""
@@ -492,13 +541,16 @@ class HIPAACompliantThesisAnalyzer:
         url_patterns = ['http://', 'https://', 'ftp://', 'ftps://']
         return any(path.strip().lower().startswith(pattern) for pattern in url_patterns)
     
-    def _extract_from_url(self, url, verify_ssl=None):
-        """Extract content from URL - download PDF temporarily and process
+    def _download_from_url(self, url, verify_ssl=None):
+        """Download PDF from URL to a temporary file
         
         Args:
             url: URL to download PDF from
             verify_ssl: Whether to verify SSL certificates. If None, automatically 
                        disables verification for localhost URLs
+        
+        Returns:
+            (temporary file path, document hash)
         """
         import requests
         import urllib3
@@ -542,21 +594,9 @@ class HIPAACompliantThesisAnalyzer:
             print(f"Downloaded successfully to temporary file: {temp_pdf_path}")
             
             # Calculate document hash for audit trail
-            with open(temp_pdf_path, 'rb') as f:
-                doc_content = f.read()
-                doc_hash = hashlib.sha256(doc_content).hexdigest()[:16]
+            doc_hash = self._file_hash(temp_pdf_path)
             
-            # Extract text and images from the downloaded file
-            text, images = self._extract_text_and_images(temp_pdf_path)
-            
-            # Clean up temporary file after extraction
-            try:
-                os.unlink(temp_pdf_path)
-                print("Temporary file cleaned up")
-            except Exception as e:
-                print(f"Warning: Could not delete temporary file: {e}")
-            
-            return text, images, doc_hash
+            return temp_pdf_path, doc_hash
             
         except requests.exceptions.SSLError as e:
             # Provide helpful error message for SSL errors
@@ -575,11 +615,52 @@ class HIPAACompliantThesisAnalyzer:
                 except:
                     pass
             raise e
+
+    def _extract_from_url(self, url, verify_ssl=None):
+        """Extract content from URL - download PDF temporarily and process.
+        Reuses the download made by _document_hash when there is one.
+        Returns (combined text, image records, OCR results, document hash)."""
+        if url in self._downloads:
+            temp_pdf_path, doc_hash = self._downloads.pop(url)
+        else:
+            temp_pdf_path, doc_hash = self._download_from_url(url, verify_ssl)
+        
+        try:
+            # Stream text and images from the downloaded file
+            combined_text, images, ocr_results = self._extract_document(temp_pdf_path, doc_hash)
+        finally:
+            # Clean up temporary file after extraction
+            try:
+                os.unlink(temp_pdf_path)
+                print("Temporary file cleaned up")
+            except Exception as e:
+                print(f"Warning: Could not delete temporary file: {e}")
+        
+        return combined_text, images, ocr_results, doc_hash
+
+    def _file_hash(self, path):
+        """Short SHA-256 of a file's raw bytes, used as the document hash"""
+        sha = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                sha.update(block)
+        return sha.hexdigest()[:16]
+
+    def _document_hash(self, pdf_path):
+        """Document hash without extracting; URLs are downloaded once and kept for extraction"""
+        if self._is_url(pdf_path):
+            if pdf_path not in self._downloads:
+                self._downloads[pdf_path] = self._download_from_url(pdf_path)
+            return self._downloads[pdf_path][1]
+        if pdf_path not in self._doc_hashes:
+            self._doc_hashes[pdf_path] = self._file_hash(pdf_path)
+        return self._doc_hashes[pdf_path]
     
-    def _prepare_document(self, pdf_path):
+    def _prepare_document(self, pdf_path, use_ocr=None, use_blip=None):
         """Common method to prepare document for processing (extract text/images/OCR)
-        Supports both file paths and URLs"""
+        Supports both file paths and URLs. OCR and BLIP only run when enabled."""
         self.check_session_timeout()
+        self._apply_image_flags(use_ocr, use_blip)
         
         # Dynamically identify if input is URL or file path
         if self._is_url(pdf_path):
@@ -589,25 +670,8 @@ class HIPAACompliantThesisAnalyzer:
             
             try:
                 # Extract from URL
-                text, images, doc_hash = self._extract_from_url(pdf_path)
+                combined_text, images, ocr_results, doc_hash = self._extract_from_url(pdf_path)
                 self.hipaa_logger.log_phi_processing(self.user_id, doc_hash, "URL_EXTRACTION")
-                
-                # Perform OCR if enabled
-                ocr_results = []
-                if self.use_ocr and images:
-                    ocr_results = self._perform_secure_ocr(images)
-                    self.hipaa_logger.log_phi_processing(self.user_id, doc_hash, "OCR_PROCESSING")
-                
-                # Analyze images if BLIP enabled
-                image_descriptions = []
-                if self.use_blip and images:
-                    image_descriptions = self._analyze_images_securely(images)
-                    self.hipaa_logger.log_phi_processing(self.user_id, doc_hash, "IMAGE_ANALYSIS")
-                
-                # Combine all text
-                ocr_text = " ".join([result['ocr_text'] for result in ocr_results if result.get('ocr_text')])
-                combined_text = text + " " + ocr_text
-                
                 return combined_text, images, ocr_results, doc_hash
                 
             except Exception as e:
@@ -618,42 +682,266 @@ class HIPAACompliantThesisAnalyzer:
             print(f"Detected file path input: {pdf_path}")
             
             # Calculate document hash for audit trail
-            with open(pdf_path, 'rb') as f:
-                doc_content = f.read()
-                doc_hash = hashlib.sha256(doc_content).hexdigest()[:16]
+            doc_hash = self._document_hash(pdf_path)
             
             self.hipaa_logger.log_phi_processing(self.user_id, doc_hash, "DOCUMENT_LOAD")
             
             try:
-                # Extract text and images
-                text, images = self._extract_text_and_images(pdf_path)
+                # Extract text and images (OCR/BLIP run page by page during extraction)
+                combined_text, images, ocr_results = self._extract_document(pdf_path, doc_hash)
                 self.hipaa_logger.log_phi_processing(self.user_id, doc_hash, "TEXT_EXTRACTION")
-                
-                # Perform OCR if enabled
-                ocr_results = []
-                if self.use_ocr and images:
-                    ocr_results = self._perform_secure_ocr(images)
-                    self.hipaa_logger.log_phi_processing(self.user_id, doc_hash, "OCR_PROCESSING")
-                
-                # Analyze images if BLIP enabled
-                image_descriptions = []
-                if self.use_blip and images:
-                    image_descriptions = self._analyze_images_securely(images)
-                    self.hipaa_logger.log_phi_processing(self.user_id, doc_hash, "IMAGE_ANALYSIS")
-                
-                # Combine all text
-                ocr_text = " ".join([result['ocr_text'] for result in ocr_results if result.get('ocr_text')])
-                combined_text = text + " " + ocr_text
-                
                 return combined_text, images, ocr_results, doc_hash
                 
             except Exception as e:
                 self.hipaa_logger.log_access(self.user_id, "PREPARATION_ERROR", pdf_path, success=False)
                 raise e
 
-    def process_document_securely(self, pdf_path, questions, output_file=None):
+    def _apply_image_flags(self, use_ocr, use_blip):
+        """Per-call flags override the analyzer defaults; a latency plan can veto both"""
+        if use_ocr is not None:
+            self.use_ocr = use_ocr
+        if use_blip is not None:
+            self.use_blip = use_blip
+        if self.latency_plan is not None:
+            self.use_ocr = self.use_ocr and self.latency_plan["ocr"]
+            self.use_blip = self.use_blip and self.latency_plan["blip"]
+
+    def _out_of_time(self, reserve_ms=0):
+        """True when a latency budget is set and less than reserve_ms of it is left"""
+        return self.deadline is not None and self.deadline.expired(reserve_ms)
+
+    def _final_reserve_ms(self):
+        return self.latency_plan["final_reserve_ms"] if self.latency_plan is not None else 0
+
+    def _mark_incomplete(self, stage, reason="Latency budget exhausted"):
+        """Flag a stage that did not finish or fell back to degraded output; such reports
+        are marked partial and never cached"""
+        if stage not in self.incomplete_stages:
+            print(f"{reason}, stage cut short: {stage}")
+            self.incomplete_stages.append(stage)
+
+    def _extract_document(self, source, doc_hash):
+        """Stream the PDF page by page, running the requested OCR/BLIP stages per page.
+
+        Images are not decoded at all when neither stage is on. OCR and BLIP
+        run once per unique image (by xref, then by pixel hash) that passes
+        image triage; unique images are buffered across pages in batches of
+        OCR_BATCH_IMAGES, so the OCR pool has work for every worker, and are
+        released once their batch is processed. Results are copied to every
+        page where the image occurs.
+        Returns (page text plus OCR text, image records without pixel data,
+        OCR results).
+        """
+        page_texts = []
+        images = []
+        ocr_results = []
+        self.image_descriptions = []
+        self.image_triage = TriageStats()
+        deduplicator = ImageDeduplicator()
+        image_meta = {}  # content hash -> size/format of the unique image
+        ocr_by_image = {}  # content hash -> OCR result of its first occurrence
+        caption_by_image = {}
+        occurrences = []  # (page, image index, content hash) of every decoded occurrence
+        pending = []  # unique images waiting for the next batch
+        
+        try:
+            for record in iter_pages(source, decode_images=self.use_ocr or self.use_blip):
+                page_texts.append(record.text)
+                if not record.images:
+                    continue
+                if not (self.use_ocr or self.use_blip):
+                    images.extend({'page': ref.page, 'index': ref.index, 'xref': ref.xref} for ref in record.images)
+                    continue
+                
+                # Image failures never stop the page text from being collected
+                try:
+                    for ref in record.images:
+                        key, info, is_new = deduplicator.resolve(ref)
+                        if key is None:
+                            continue
+                        if info is not None:
+                            image_meta.setdefault(key, {'size': info['size'], 'format': info['format']})
+                        if is_new and self.image_triage.keep(info['image']):
+                            pending.append((key, info))
+                        occurrences.append((ref.page, ref.index, key))
+                        images.append({'page': ref.page, 'index': ref.index, 'xref': ref.xref, **image_meta[key]})
+                    
+                    if len(pending) >= OCR_BATCH_IMAGES:
+                        batch, pending = pending, []
+                        self._process_image_batch(batch, ocr_by_image, caption_by_image)
+                except Exception as e:
+                    print(f"Error processing images on page {record.page}: {e}")
+                    self._mark_incomplete("images", "Image processing failed")
+        except Exception as e:
+            print(f"Error in secure extraction: {e}")
+            self._mark_incomplete("text_extraction", "PDF extraction failed")
+        
+        if pending:
+            try:
+                self._process_image_batch(pending, ocr_by_image, caption_by_image)
+            except Exception as e:
+                print(f"Error processing images: {e}")
+                self._mark_incomplete("images", "Image processing failed")
+        
+        # Fan results of unique images out to every occurrence
+        for page, index, key in occurrences:
+            if key in ocr_by_image:
+                ocr_results.append({**ocr_by_image[key], 'page': page, 'image_index': index})
+            if key in caption_by_image:
+                self.image_descriptions.append({**caption_by_image[key], 'page': page, 'image_index': index})
+        
+        if ocr_results:
+            self.hipaa_logger.log_phi_processing(self.user_id, doc_hash, "OCR_PROCESSING")
+        if self.image_descriptions:
+            self.hipaa_logger.log_phi_processing(self.user_id, doc_hash, "IMAGE_ANALYSIS")
+        if len(images) > len(image_meta):
+            print(f"Processed {len(image_meta)} unique images for {len(images)} image occurrences")
+        if self.image_triage.skipped:
+            print(f"Image triage skipped {sum(self.image_triage.skipped.values())} of "
+                  f"{self.image_triage.checked} unique images: {dict(self.image_triage.skipped)}")
+        
+        # Combine all text; a repeated image contributes its OCR text once
+        ocr_text = " ".join([result['ocr_text'] for result in ocr_by_image.values() if result.get('ocr_text')])
+        combined_text = join_page_text(page_texts) + " " + ocr_text
+        
+        return combined_text, images, ocr_results
+
+    def _process_image_batch(self, batch, ocr_by_image, caption_by_image):
+        """OCR and caption a batch of (content hash, image record), unless out of time"""
+        keys = [key for key, _ in batch]
+        batch_images = [info for _, info in batch]
+        
+        # Perform OCR if enabled
+        if self.use_ocr and self._out_of_time():
+            self._mark_incomplete("ocr")
+        elif self.use_ocr:
+            if self._ensure_ocr():
+                ocr_by_image.update(zip(keys, self._perform_secure_ocr(batch_images)))
+            else:
+                self.use_ocr = False
+        
+        # Analyze images if BLIP enabled (the model is loaded only for uncached images)
+        if self.use_blip and self._out_of_time():
+            self._mark_incomplete("blip")
+        elif self.use_blip:
+            descriptions = self._analyze_images_securely(batch_images)
+            caption_by_image.update((key, d) for key, d in zip(keys, descriptions) if d is not None)
+
+    def _emit(self, event, **data):
+        """Send a progress event to the streaming consumer, if any"""
+        if self.progress_callback is not None:
+            self.progress_callback({"event": event, **data})
+
+    def _sampling_kwargs(self):
+        """Decoding settings for summaries and answers"""
+        if self.latency_plan is not None:
+            return {"do_sample": self.latency_plan["do_sample"], "num_beams": self.latency_plan["num_beams"]}
+        return {"do_sample": False} if self.deterministic else {"do_sample": True, "temperature": 0.7}
+
+    def _generation_params(self):
+        """Settings that change generated text; part of every result cache key"""
+        return {
+            "summary_token_budget": self.summary_token_budget,
+            "summary_mode": self.summary_mode,
+            "section_token_budget": SUMMARY_SECTION_TOKEN_BUDGET if self.summary_mode == "sections" else None,
+            "qa_mode": self.qa_mode,
+            "span_qa_lexical_weight": SPAN_QA_LEXICAL_WEIGHT if self.qa_mode == "extractive" else None,
+            "chunk_overlap_tokens": SUMMARY_CHUNK_OVERLAP_TOKENS,
+            "chunk_reserve_tokens": SUMMARY_CHUNK_RESERVE_TOKENS,
+            "reduce_fan_in": SUMMARY_REDUCE_FAN_IN,
+            "max_depth": SUMMARY_MAX_DEPTH,
+            "content_defined_chunks": SUMMARY_CHUNK_MEMO,
+            "deterministic": self.deterministic,
+            "latency_plan": self.latency_plan,
+            "image_triage": triage_settings() if (self.use_ocr or self.use_blip) else None,
+            "qa_retrieval": {
+                "passage_tokens": RETRIEVAL_PASSAGE_TOKENS,
+                "top_k": RETRIEVAL_TOP_K,
+                "bm25_weight": RETRIEVAL_BM25_WEIGHT,
+                "prompt_reserve_tokens": QA_PROMPT_RESERVE_TOKENS,
+                "embedding_model": EMBEDDING_MODEL_NAME
+            }
+        }
+
+    def _lookup_result(self, kind, pdf_path, use_ocr=None, use_blip=None, questions=None):
+        """Return (cache key, cached report or None) before any extraction or inference.
+        Requests that sample get no key: one frozen sample would be served for every later miss."""
+        if not RESULT_CACHE_ENABLED or not self.deterministic:
+            return None, None
+        self.check_session_timeout()
+        self._apply_image_flags(use_ocr, use_blip)
+
+        doc_hash = self._document_hash(pdf_path)
+        cache_key = make_cache_key(
+            kind=kind,
+            document_hash=doc_hash,
+            model_name=self.model_name,
+            precision=self.precision,
+            backend=self.backend,
+            ocr=self.use_ocr,
+            blip=self.use_blip,
+            generation=self._generation_params(),
+            questions=list(questions or [])
+        )
+        report = result_cache.get(cache_key, self.secure_handler)
+        if report is None:
+            return cache_key, None
+
+        self.hipaa_logger.log_phi_processing(self.user_id, doc_hash, "RESULT_CACHE_HIT")
+        compliance = report.get("hipaa_compliance", {})
+        compliance["user_id"] = self.user_id
+        compliance["processing_timestamp"] = datetime.now().isoformat()
+        if "session_id" in compliance:
+            compliance["session_id"] = hashlib.md5(f"{self.user_id}{self.session_start}".encode()).hexdigest()[:8]
+        report["cache"] = {"hit": True}
+        return cache_key, report
+
+    def _store_result(self, cache_key, report):
+        """Cache a freshly computed report (on disk, encrypted, only when a password is set).
+        Partial reports (latency budget, failed stages, fallback output) are never cached."""
+        if cache_key is None:
+            return
+        if not self.incomplete_stages:
+            result_cache.put(cache_key, report, self.secure_handler)
+        report["cache"] = {"hit": False}
+
+    def _processing_options(self):
+        """Options actually used for this request, recorded in reports"""
+        return {
+            "model_name": self.model_name,
+            "precision": self.precision,
+            "backend": self.backend,
+            "summary_token_budget": self.summary_token_budget,
+            "summary_mode": self.summary_mode,
+            "qa_mode": self.qa_mode,
+            "deterministic": self.deterministic,
+            "ocr": self.use_ocr,
+            "blip": self.use_blip,
+            "latency_budget": self._latency_report(),
+            "incomplete_stages": list(self.incomplete_stages)
+        }
+
+    def _latency_report(self):
+        """Plan, elapsed time and any stages cut short; None without a latency budget"""
+        if self.deadline is None:
+            return None
+        return {
+            "max_latency_ms": self.deadline.budget_ms,
+            "elapsed_ms": self.deadline.elapsed_ms(),
+            "partial": bool(self.incomplete_stages),
+            "incomplete_stages": list(self.incomplete_stages),
+            "plan": self.latency_plan
+        }
+
+    def process_document_securely(self, pdf_path, questions, output_file=None, use_ocr=None, use_blip=None):
         """Process document with full HIPAA compliance"""
-        combined_text, images, ocr_results, doc_hash = self._prepare_document(pdf_path)
+        cache_key, cached = self._lookup_result("analysis", pdf_path, use_ocr, use_blip, questions)
+        if cached is not None:
+            if output_file:
+                self.secure_handler.secure_save(cached, output_file)
+            return cached
+        
+        combined_text, images, ocr_results, doc_hash = self._prepare_document(pdf_path, use_ocr, use_blip)
         
         try:
             # Generate analysis
@@ -684,16 +972,21 @@ class HIPAACompliantThesisAnalyzer:
                     "total_images": len(images),
                     "device_used": str(self.device)
                 },
+                "processing_options": self._processing_options(),
                 "text_analysis": {
                     "summary": summary,
+                    "summary_stats": self.summary_stats,
+                    "section_summaries": self.section_summaries,
                     "key_terms": key_terms[:15],
                     "sections_found": list(sections.keys())
                 },
                 "image_analysis": {
                     "total_images_extracted": len(images),
                     "images_with_text": len([r for r in ocr_results if r.get('has_text', False)]),
+                    "images_captioned": len([d for d in self.image_descriptions if not d.get('error')]),
                     "ocr_available": self.use_ocr,
-                    "blip_available": self.use_blip
+                    "blip_available": self.use_blip,
+                    "triage": self.image_triage.report()
                 },
                 "question_responses": question_answers,
                 "statistics": {
@@ -705,6 +998,8 @@ class HIPAACompliantThesisAnalyzer:
                 }
             }
             
+            self._store_result(cache_key, report)
+            
             # Save securely if output file specified
             if output_file:
                 self.secure_handler.secure_save(report, output_file)
@@ -716,9 +1011,16 @@ class HIPAACompliantThesisAnalyzer:
             self.hipaa_logger.log_access(self.user_id, "PROCESSING_ERROR", pdf_path, success=False)
             raise e
 
-    def process_summary_only(self, pdf_path, output_file=None):
+    def process_summary_only(self, pdf_path, output_file=None, use_ocr=None, use_blip=None):
         """Process document for summary only"""
-        combined_text, images, ocr_results, doc_hash = self._prepare_document(pdf_path)
+        cache_key, cached = self._lookup_result("summary", pdf_path, use_ocr, use_blip)
+        if cached is not None:
+            if output_file:
+                self.secure_handler.secure_save(cached, output_file)
+            return cached
+        
+        combined_text, images, ocr_results, doc_hash = self._prepare_document(pdf_path, use_ocr, use_blip)
+        self._emit("extraction", document_hash=doc_hash, characters=len(combined_text), images=len(images))
         
         try:
             # Generate summary
@@ -735,13 +1037,18 @@ class HIPAACompliantThesisAnalyzer:
                     "document_hash": doc_hash,
                     "processing_timestamp": datetime.now().isoformat()
                 },
+                "processing_options": self._processing_options(),
                 "text_analysis": {
                     "summary": summary,
+                    "summary_stats": self.summary_stats,
+                    "section_summaries": self.section_summaries,
                     "key_terms": key_terms[:15],
                     "sections_found": list(sections.keys())
                 }
             }
             
+            self._store_result(cache_key, report)
+            
             if output_file:
                 self.secure_handler.secure_save(report, output_file)
             
@@ -767,8 +1074,11 @@ class HIPAACompliantThesisAnalyzer:
                     "document_hash": doc_hash,
                     "processing_timestamp": datetime.now().isoformat()
                 },
+                "processing_options": self._processing_options(),
                 "text_analysis": {
                     "summary": summary,
+                    "summary_stats": self.summary_stats,
+                    "section_summaries": self.section_summaries,
                     "key_terms": key_terms[:15],
                     "sections_found": list(sections.keys())
                 }
@@ -783,9 +1093,15 @@ class HIPAACompliantThesisAnalyzer:
             print(f"Error in process_summary_only_from_text: {e}")
             raise e
 
-    def process_questions_only(self, pdf_path, questions, output_file=None):
+    def process_questions_only(self, pdf_path, questions, output_file=None, use_ocr=None, use_blip=None):
         """Process document for Q&A only"""
-        combined_text, images, ocr_results, doc_hash = self._prepare_document(pdf_path)
+        cache_key, cached = self._lookup_result("questions", pdf_path, use_ocr, use_blip, questions)
+        if cached is not None:
+            if output_file:
+                self.secure_handler.secure_save(cached, output_file)
+            return cached
+        
+        combined_text, images, ocr_results, doc_hash = self._prepare_document(pdf_path, use_ocr, use_blip)
         
         try:
             # Generate answers
@@ -800,9 +1116,12 @@ class HIPAACompliantThesisAnalyzer:
                     "document_hash": doc_hash,
                     "processing_timestamp": datetime.now().isoformat()
                 },
+                "processing_options": self._processing_options(),
                 "question_responses": question_answers
             }
             
+            self._store_result(cache_key, report)
+            
             if output_file:
                 self.secure_handler.secure_save(report, output_file)
             
@@ -826,6 +1145,7 @@ class HIPAACompliantThesisAnalyzer:
                     "document_hash": doc_hash,
                     "processing_timestamp": datetime.now().isoformat()
                 },
+                "processing_options": self._processing_options(),
                 "question_responses": question_answers
             }
             
@@ -838,9 +1158,9 @@ class HIPAACompliantThesisAnalyzer:
             print(f"Error in process_questions_only_from_text: {e}")
             raise e        
 
-    def process_annotations_only(self, pdf_path, output_file=None):
+    def process_annotations_only(self, pdf_path, output_file=None, use_ocr=None, use_blip=None):
         """Process document for PubTator annotations only"""
-        combined_text, images, ocr_results, doc_hash = self._prepare_document(pdf_path)
+        combined_text, images, ocr_results, doc_hash = self._prepare_document(pdf_path, use_ocr, use_blip)
         
         try:
             # Initialize PubTator Annotator
@@ -934,114 +1254,65 @@ class HIPAACompliantThesisAnalyzer:
             if conn:
                 conn.close()        
     
-    def _extract_text_and_images(self, pdf_path):
-        """Securely extract text and images from PDF"""
-        text = ""
-        images = []
-        
-        try:
-            # Use PyMuPDF for comprehensive extraction
-            doc = fitz.open(pdf_path)
-            
-            for page_num in range(len(doc)):
-                page = doc.load_page(page_num)
-                
-                # Extract text
-                page_text = page.get_text()
-                if page_text.strip():
-                    text += page_text + "\n"
-                
-                # Extract images
-                image_list = page.get_images()
-                
-                for img_index, img in enumerate(image_list):
-                    try:
-                        xref = img[0]
-                        pix = fitz.Pixmap(doc, xref)
-                        
-                        if pix.n - pix.alpha < 4:
-                            img_data = pix.tobytes("ppm")
-                            img_pil = Image.open(io.BytesIO(img_data))
-                            
-                            image_info = {
-                                'page': page_num + 1,
-                                'index': img_index,
-                                'image': img_pil,
-                                'size': img_pil.size,
-                                'format': img_pil.format or 'Unknown'
-                            }
-                            images.append(image_info)
-                            
-                        pix = None
-                        
-                    except Exception as e:
-                        print(f"Error extracting image {img_index} from page {page_num + 1}: {e}")
-                        continue
-            
-            doc.close()
-            
-        except Exception as e:
-            print(f"Error in secure extraction: {e}")
-        
-        return text, images
-    
     def _perform_secure_ocr(self, images):
-        """Perform OCR with audit logging"""
+        """Perform OCR with audit logging (in the OCR worker pool when OCR_WORKERS is set).
+        Images OCR'd before, in any document, are answered from the image artifact cache."""
         ocr_results = []
         
-        for i, img_info in enumerate(images):
-            try:
-                img = img_info['image']
-                if img.mode != 'RGB':
-                    img = img.convert('RGB')
-                
-                # Preprocess for OCR
-                if OPENCV_AVAILABLE:
-                    img_array = np.array(img)
-                    gray = cv2.cvtColor(img_array, cv2.COLOR_RGB2GRAY)
-                    denoised = cv2.medianBlur(gray, 3)
-                    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8,8))
-                    enhanced = clahe.apply(denoised)
-                    _, thresh = cv2.threshold(enhanced, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-                    processed_img = Image.fromarray(thresh)
-                else:
-                    gray = img.convert('L')
-                    enhancer = ImageEnhance.Contrast(gray)
-                    enhanced = enhancer.enhance(2.0)
-                    processed_img = enhanced.filter(ImageFilter.SHARPEN)
-                
-                # Perform OCR locally
-                ocr_text = pytesseract.image_to_string(processed_img, config='--psm 6')
-                
-                ocr_result = {
-                    'page': img_info['page'],
-                    'image_index': img_info['index'],
-                    'ocr_text': ocr_text.strip(),
-                    'has_text': bool(ocr_text.strip()),
-                    'processing_method': 'Local_OCR'
-                }
-                
-                ocr_results.append(ocr_result)
-                
-            except Exception as e:
+        # Perform OCR locally
+        texts, cache_hits = ocr_with_cache(images, self.secure_handler)
+        if cache_hits:
+            print(f"Reused cached OCR text for {cache_hits} of {len(images)} images")
+        for img_info, ocr_text in zip(images, texts):
+            if isinstance(ocr_text, Exception):
                 ocr_results.append({
                     'page': img_info['page'],
                     'image_index': img_info['index'],
                     'ocr_text': '',
                     'has_text': False,
-                    'error': str(e)
+                    'error': str(ocr_text)
                 })
+                continue
+            
+            ocr_results.append({
+                'page': img_info['page'],
+                'image_index': img_info['index'],
+                'ocr_text': ocr_text,
+                'has_text': bool(ocr_text),
+                'processing_method': 'Local_OCR'
+            })
         
         return ocr_results
     
     def _analyze_images_securely(self, images):
-        """Analyze images locally with BLIP"""
+        """Analyze images locally with BLIP.
+
+        Returns one description per image. Captions cached for the same
+        pixels (from any document) are reused; BLIP is loaded only when an
+        image is not cached, and images it could not caption for lack of the
+        model are None.
+        """
         if not self.use_blip:
             return []
         
+        precision = resolve_precision(self.precision)
         descriptions = []
         
         for img_info in images:
+            caption = get_caption(img_info, precision, self.secure_handler)
+            if caption is not None:
+                descriptions.append({
+                    'page': img_info['page'],
+                    'image_index': img_info['index'],
+                    'caption': caption,
+                    'processing_method': 'Local_BLIP'
+                })
+                continue
+            if not self.use_blip or not self._ensure_blip():
+                self.use_blip = False
+                descriptions.append(None)
+                continue
+            
             try:
                 image = img_info['image']
                 if image.mode != 'RGB':
@@ -1050,9 +1321,10 @@ class HIPAACompliantThesisAnalyzer:
                 inputs = self.blip_processor(image, return_tensors="pt").to(self.device)
                 
                 with torch.no_grad():
-                    out = self.blip_model.generate(**inputs, max_length=100, num_beams=5)
+                    out = self.blip_model.generate(**inputs, **BLIP_GENERATION)
                 
                 caption = self.blip_processor.decode(out[0], skip_special_tokens=True)
+                put_caption(img_info, precision, caption, self.secure_handler)
                 
                 description = {
                     'page': img_info['page'],
@@ -1073,8 +1345,8 @@ class HIPAACompliantThesisAnalyzer:
         
         return descriptions
     
-    def _extract_key_sections(self, text):
-        """Extract key sections from text"""
+    def _extract_key_sections(self, text, max_chars=1000):
+        """Extract key sections from text (each truncated to max_chars; None keeps full sections)"""
         sections = {}
         section_patterns = {
             'abstract': r'abstract\s*:?\s*(.*?)(?=\n\s*(?:introduction|chapter|acknowledgment|table of contents))',
@@ -1085,9 +1357,10 @@ class HIPAACompliantThesisAnalyzer:
         }
 
         for section_name, pattern in section_patterns.items():
-            match = re.search(pattern, text.lower(), re.DOTALL | re.IGNORECASE)
+            match = re.search(pattern, text, re.DOTALL | re.IGNORECASE)
             if match:
-                sections[section_name] = match.group(1).strip()[:1000]  # Truncate for privacy
+                section_text = match.group(1).strip()
+                sections[section_name] = section_text[:max_chars] if max_chars else section_text  # Truncate for privacy
 
         return sections
     
@@ -1123,130 +1396,440 @@ class HIPAACompliantThesisAnalyzer:
             return []
     
     def _generate_summary_secure(self, text):
-        """Generate summary using local T5 model with recursive chunking"""
+        """Generate summary using local T5 model with a bounded tree reduce.
+
+        With a summary token budget set, only the most salient chunks (BM25
+        against the document centroid) within that budget are summarized.
+        Chunk summaries are then merged SUMMARY_REDUCE_FAN_IN at a time for at
+        most SUMMARY_MAX_DEPTH levels before the final pass.
+        """
         try:
             if self.summarizer is None:
                 print("Summarizer not available, using fallback method")
+                self._mark_incomplete("summary", "Summarizer not available")
                 # Fallback to extractive summary
                 sentences = re.split(r'[.!?]+', text)
                 return " ".join(sentences[:3]) + "..."
             
+            self.section_summaries = {}
+            if self.summary_mode == "sections":
+                sections = self._extract_key_sections(text, max_chars=None)
+                if sections:
+                    return self._summarize_sections(sections)
+                print("No sections detected, summarizing the whole document")
+            
             clean_text = re.sub(r'\s+', ' ', text).strip()
             
             # 1. Chunking with Overlap
-            # T5-small context matches approx 512 tokens (~2000 chars), but we use 1000 for safety and speed
-            chunk_size = 1000
-            overlap = 200
+            # Chunks are measured in model tokens and filled up to the model's input limit
+            chunks = chunk_by_tokens(
+                clean_text,
+                self.tokenizer,
+                overlap_tokens=SUMMARY_CHUNK_OVERLAP_TOKENS,
+                reserve_tokens=SUMMARY_CHUNK_RESERVE_TOKENS,
+                content_defined=SUMMARY_CHUNK_MEMO
+            )
+            self.summary_stats = {"chunks_total": len(chunks), "chunks_summarized": len(chunks), "chunks_reused": 0,
+                                  "levels": []}
             
             # If text is small enough, summarize directly
-            if len(clean_text) <= chunk_size + overlap:
+            if len(chunks) <= 1:
                  summary = self.summarizer(
                     clean_text,
                     max_length=200,
                     min_length=50,
-                    do_sample=True,
-                    temperature=0.7
+                    truncation=True,
+                    **self._sampling_kwargs()
                 )
                  return summary[0]['summary_text']
-
-            # Otherwise, chunk it
-            chunks = []
-            for i in range(0, len(clean_text), chunk_size - overlap):
-                chunks.append(clean_text[i:i + chunk_size])
+            
+            # Extractive pre-selection keeps summarization cost bounded for long documents;
+            # a latency plan also caps how many chunks get abstractive treatment
+            max_chunks = self.latency_plan["max_chunks"] if self.latency_plan is not None else None
+            over_chunk_cap = max_chunks is not None and len(chunks) > max_chunks
+            if self.summary_token_budget > 0 or over_chunk_cap:
+                token_counts = count_tokens(self.tokenizer, chunks)
+                token_budget = self.summary_token_budget if self.summary_token_budget > 0 else sum(token_counts)
+                if sum(token_counts) > token_budget or over_chunk_cap:
+                    selected = select_salient_chunks(chunks, token_counts, token_budget, top_k=max_chunks,
+                                                     stop_words=self.stop_words)
+                    chunks = [chunks[i] for i in selected] or chunks[:1]
+                    self.summary_stats["chunks_summarized"] = len(chunks)
             
             print(f"Summarizing {len(chunks)} text chunks...")
             
-            # 2. Map (Summarize each chunk)
-            chunk_summaries = []
-            for i, chunk in enumerate(chunks):
-                try:
-                    # Skip very short chunks (e.g. end of file)
-                    if len(chunk) < 100:
-                        continue
-                        
-                    summary_output = self.summarizer(
-                        chunk,
-                        max_length=150,
-                        min_length=30,
-                        do_sample=False, # Faster deterministic generation for chunks
-                        truncation=True
-                    )
-                    chunk_summaries.append(summary_output[0]['summary_text'])
-                except Exception as chunk_error:
-                    print(f"Error summarizing chunk {i}: {chunk_error}")
-                    continue
+            # 2. Map (Summarize chunks in padded batches)
+            # Skip very short chunks (e.g. end of file)
+            chunks = [chunk for chunk in chunks if len(chunk) >= 100]
+            self._emit("chunking", chunks_total=self.summary_stats["chunks_total"], chunks_to_summarize=len(chunks))
+            chunk_summaries = self._summarize_chunks(
+                chunks,
+                on_summary=lambda i, summary: self._emit("chunk_summary", index=i, total=len(chunks), summary=summary),
+                memoize=SUMMARY_CHUNK_MEMO
+            )
+            self._record_summary_level(0, chunks, chunk_summaries)
 
             if not chunk_summaries:
+                 self._mark_incomplete("summary", "No chunk summaries produced")
                  return "Could not generate summary from text chunks."
 
-            # 3. Reduce (Combine summaries)
+            # 3. Reduce (Merge summaries with a fixed fan-in until they fit one model input)
+            input_limit = model_input_limit(self.tokenizer) - SUMMARY_CHUNK_RESERVE_TOKENS
+            depth = 0
+            while (len(chunk_summaries) > 1 and depth < SUMMARY_MAX_DEPTH
+                   and count_tokens(self.tokenizer, [" ".join(chunk_summaries)])[0] > input_limit):
+                if self._out_of_time(self._final_reserve_ms()):
+                    self._mark_incomplete("summary_reduce")
+                    break
+                depth += 1
+                groups = [
+                    " ".join(chunk_summaries[i:i + SUMMARY_REDUCE_FAN_IN])
+                    for i in range(0, len(chunk_summaries), SUMMARY_REDUCE_FAN_IN)
+                ]
+                print(f" Reduce level {depth}: merging {len(chunk_summaries)} summaries into {len(groups)}...")
+                reduced = self._summarize_chunks(groups)
+                if len(reduced) < len(groups):
+                    print(f" Reduce level {depth}: {len(groups) - len(reduced)} of {len(groups)} groups failed")
+                    self._mark_incomplete("summary_reduce", f"Reduce level {depth} failed")
+                if not reduced:
+                    # Nothing to merge further; keep the previous level's summaries
+                    break
+                chunk_summaries = reduced
+                self._record_summary_level(depth, groups, chunk_summaries)
+                self._emit("reduce_level", **self.summary_stats["levels"][-1])
+
             combined_summary_text = " ".join(chunk_summaries)
             
-            # 4. Recursive Step
-            # If the combined summary is still too long, recurse
-            # set threshold to ~2000 chars (approx max input for T5)
-            if len(combined_summary_text) > 2000:
-                print(f" Combined summary length {len(combined_summary_text)} is too long, recursing level...")
-                return self._generate_summary_secure(combined_summary_text)
+            # Out of time: the chunk summaries are the best result available
+            if self._out_of_time():
+                self._mark_incomplete("summary_final")
+                return combined_summary_text
             
-            # 5. Final Pass
+            # 4. Final Pass (input is truncated if the depth limit was reached first)
+            final_lengths = {"max_length": 300, "min_length": 100}
+            if self.latency_plan is not None:
+                final_lengths = {"max_length": self.latency_plan["final_max_length"],
+                                 "min_length": self.latency_plan["final_min_length"]}
             final_summary = self.summarizer(
                 combined_summary_text,
-                max_length=300,
-                min_length=100,
-                do_sample=True,
-                temperature=0.7
+                truncation=True,
+                **final_lengths,
+                **self._sampling_kwargs()
             )
             return final_summary[0]['summary_text']
             
         except Exception as e:
             print(f"Error in T5 summarization: {e}")
+            self._mark_incomplete("summary", "Summarization failed")
             # Fallback to extractive summary
             sentences = re.split(r'[.!?]+', text)
             return " ".join(sentences[:5]) + "..."
+
+    def _summarize_sections(self, sections):
+        """Summarize each detected section on its own and assemble them in section order.
+
+        Every section is chunked and trimmed to SUMMARY_SECTION_TOKEN_BUDGET
+        tokens by salience, so per-section cost is bounded. The chunks of all
+        sections share one batched (or pooled) map stage, and sections with
+        several chunk summaries get a single merge pass, batched the same way.
+        """
+        self.summary_stats = {"mode": "sections", "chunks_total": 0, "chunks_summarized": 0, "chunks_reused": 0,
+                              "levels": [], "sections": {}}
+        flat = []  # (section name, chunk) in section order
+        for name, section_text in sections.items():
+            clean_section = re.sub(r'\s+', ' ', section_text).strip()
+            if len(clean_section) < 100:
+                continue
+            chunks = chunk_by_tokens(
+                clean_section,
+                self.tokenizer,
+                overlap_tokens=SUMMARY_CHUNK_OVERLAP_TOKENS,
+                reserve_tokens=SUMMARY_CHUNK_RESERVE_TOKENS,
+                content_defined=SUMMARY_CHUNK_MEMO
+            )
+            chunks_total = len(chunks)
+            token_counts = count_tokens(self.tokenizer, chunks)
+            if sum(token_counts) > SUMMARY_SECTION_TOKEN_BUDGET:
+                selected = select_salient_chunks(chunks, token_counts, SUMMARY_SECTION_TOKEN_BUDGET,
+                                                 stop_words=self.stop_words)
+                chunks = [chunks[i] for i in selected] or chunks[:1]
+            self.summary_stats["sections"][name] = {"chunks_total": chunks_total, "chunks_summarized": len(chunks)}
+            self.summary_stats["chunks_total"] += chunks_total
+            self.summary_stats["chunks_summarized"] += len(chunks)
+            flat.extend((name, chunk) for chunk in chunks)
+
+        if not flat:
+            return "Could not generate summary from detected sections."
+
+        print(f"Summarizing {len(flat)} chunks across {len(self.summary_stats['sections'])} sections...")
+        self._emit("chunking", chunks_total=self.summary_stats["chunks_total"], chunks_to_summarize=len(flat),
+                   sections=list(self.summary_stats["sections"]))
+
+        # Map: one batched pass over every section's chunks, regrouped by section
+        by_section = {name: [] for name in self.summary_stats["sections"]}
+
+        def collect(i, summary):
+            by_section[flat[i][0]].append((i, summary))
+            self._emit("chunk_summary", index=i, total=len(flat), section=flat[i][0], summary=summary)
+
+        chunk_texts = [chunk for _, chunk in flat]
+        map_outputs = self._summarize_chunks(chunk_texts, on_summary=collect, memoize=SUMMARY_CHUNK_MEMO)
+        self._record_summary_level(0, chunk_texts, map_outputs)
+
+        section_summaries = {
+            name: [summary for _, summary in sorted(outputs)]
+            for name, outputs in by_section.items() if outputs
+        }
+
+        # Merge: sections with more than one chunk summary, batched across sections
+        to_merge = [name for name, summaries in section_summaries.items() if len(summaries) > 1]
+        merged = {name: " ".join(section_summaries[name]) for name in to_merge}
+        if to_merge and self._out_of_time(self._final_reserve_ms()):
+            self._mark_incomplete("section_merge")
+        elif to_merge:
+            merge_inputs = [merged[name] for name in to_merge]
+
+            def store(i, summary):
+                merged[to_merge[i]] = summary
+
+            merge_outputs = self._summarize_chunks(merge_inputs, on_summary=store)
+            self._record_summary_level(1, merge_inputs, merge_outputs)
+            if len(merge_outputs) < len(merge_inputs):
+                self._mark_incomplete("section_merge", "Section merge failed")
+
+        for name, summaries in section_summaries.items():
+            self.section_summaries[name] = merged.get(name, summaries[0])
+            self._emit("section_summary", section=name, summary=self.section_summaries[name])
+
+        return "\n\n".join(f"{name.capitalize()}: {summary}" for name, summary in self.section_summaries.items())
+
+    def _record_summary_level(self, level, inputs, outputs):
+        """Track size and compression ratio of one map/reduce level"""
+        input_chars = sum(len(t) for t in inputs)
+        output_chars = sum(len(t) for t in outputs)
+        self.summary_stats["levels"].append({
+            "level": level,
+            "inputs": len(inputs),
+            "outputs": len(outputs),
+            "input_characters": input_chars,
+            "output_characters": output_chars,
+            "compression_ratio": round(output_chars / input_chars, 3) if input_chars else None
+        })
     
+    def _summarize_chunks(self, chunks, on_summary=None, memoize=False):
+        """Summarize chunks in batches of SUMMARY_BATCH_SIZE, keeping order.
+
+        Batches are spread across the summary worker pool when SUMMARY_WORKERS
+        is set, otherwise they run in this process. on_summary(index, summary)
+        is called for each chunk as soon as its batch completes. With memoize,
+        chunks summarized before (same normalized text, model and parameters)
+        are reused and only changed chunks reach the model.
+        """
+        gen_kwargs = {
+            "max_length": 150,
+            "min_length": 30,
+            "do_sample": False, # Faster deterministic generation for chunks
+            "truncation": True
+        }
+        if self.latency_plan is not None:
+            gen_kwargs["max_length"] = self.latency_plan["map_max_length"]
+            gen_kwargs["num_beams"] = self.latency_plan["num_beams"]
+        if not memoize:
+            return self._run_summaries(chunks, gen_kwargs, on_summary)
+
+        keys = [
+            make_cache_key(
+                chunk_hash=self.calculate_document_hash(re.sub(r'\s+', ' ', chunk).strip()),
+                model_name=self.model_name,
+                precision=self.precision,
+                backend=self.backend,
+                generation=gen_kwargs
+            )
+            for chunk in chunks
+        ]
+        summaries = [None] * len(chunks)
+        for i, key in enumerate(keys):
+            cached = chunk_summary_cache.get(key, self.secure_handler)
+            if cached is not None:
+                summaries[i] = cached["summary"]
+                if on_summary is not None:
+                    on_summary(i, summaries[i])
+
+        missing = [i for i, summary in enumerate(summaries) if summary is None]
+        self.summary_stats["chunks_reused"] = len(chunks) - len(missing)
+        if missing:
+            print(f"Reusing {len(chunks) - len(missing)} cached chunk summaries, summarizing {len(missing)}...")
+
+        def store(j, summary):
+            i = missing[j]
+            summaries[i] = summary
+            chunk_summary_cache.put(keys[i], {"summary": summary}, self.secure_handler)
+            if on_summary is not None:
+                on_summary(i, summary)
+
+        self._run_summaries([chunks[i] for i in missing], gen_kwargs, store)
+        return [summary for summary in summaries if summary is not None]
+
+    def _run_summaries(self, chunks, gen_kwargs, on_summary=None):
+        """Batched (or pooled) generate calls; failed chunks are dropped.
+        With a latency budget, batches stop once only the final-pass reserve is left."""
+        batches = [chunks[start:start + SUMMARY_BATCH_SIZE] for start in range(0, len(chunks), SUMMARY_BATCH_SIZE)]
+        pool = get_summary_pool(self.model_name, self.precision, self.backend)
+
+        chunk_summaries = []
+        if pool is not None:
+            results = summarize_batches(pool, batches, gen_kwargs)
+        else:
+            results = ((i, self._summarize_batch_local(batch, gen_kwargs)) for i, batch in enumerate(batches))
+
+        for i, result in results:
+            start = i * SUMMARY_BATCH_SIZE
+            if isinstance(result, Exception):
+                # Retry one by one so a single bad chunk doesn't drop the whole batch
+                print(f"Error summarizing chunks {start}-{start + len(batches[i]) - 1}: {result}")
+                produced = []
+                for j, chunk in enumerate(batches[i], start):
+                    try:
+                        summary_output = self.summarizer(chunk, **gen_kwargs)
+                        produced.append((j, summary_output[0]['summary_text']))
+                    except Exception as chunk_error:
+                        print(f"Error summarizing chunk {j}: {chunk_error}")
+                        self._mark_incomplete("summary_chunks", "Chunk summarization failed")
+            else:
+                produced = list(enumerate(result, start))
+
+            for j, summary in produced:
+                chunk_summaries.append(summary)
+                if on_summary is not None:
+                    on_summary(j, summary)
+
+            if i < len(batches) - 1 and self._out_of_time(self._final_reserve_ms()):
+                self._mark_incomplete("summary_map")
+                results.close()
+                break
+        return chunk_summaries
+
+    def _summarize_batch_local(self, batch, gen_kwargs):
+        """One padded generate call in this process; returns the exception on failure"""
+        try:
+            outputs = self.summarizer(batch, batch_size=len(batch), **gen_kwargs)
+            return [output['summary_text'] for output in outputs]
+        except Exception as e:
+            return e
+
+    def _question_contexts(self, questions, text):
+        """Retrieved passages for each question; the start of the document if retrieval fails"""
+        try:
+            question_set = question_set_registry.resolve(questions)
+            index, embedder = get_retrieval_index(text, self.tokenizer, self.stop_words, self.secure_handler)
+            limit = model_input_limit(self.tokenizer) - QA_PROMPT_RESERVE_TOKENS
+            budgets = [limit - n for n in question_set.token_counts(self.tokenizer)]
+            return index.retrieve(questions, budgets, embedder=embedder, question_set=question_set)
+        except Exception as e:
+            print(f"Passage retrieval failed, using document start as context: {e}")
+            self._mark_incomplete("retrieval", "Passage retrieval failed")
+            return [text[:1000]] * len(questions)
+
     def _answer_questions_secure(self, questions, text):
-        """Answer questions using local T5 model"""
+        """Answer questions using local T5 model, each from its own retrieved passages.
+
+        Prompts go through the Q&A pipeline as padded batches of QA_BATCH_SIZE;
+        a failed batch is retried one question at a time. In the extractive
+        Q&A mode no text is generated; see _answer_questions_extractive.
+        """
+        if self.qa_mode == "extractive":
+            return self._answer_questions_extractive(questions, text)
+        
         answers = {}
+        if self.qa_pipeline is None:
+            self._mark_incomplete("questions", "Q&A pipeline not available")
+            for question in questions:
+                answers[question] = {
+                    'answer': 'Q&A pipeline not available - using fallback',
+                    'method': 'Fallback',
+                    'processed_securely': True
+                }
+            return answers
+        
+        contexts = self._question_contexts(questions, text)
+        prompts = [f"question: {question} context: {context}" for question, context in zip(questions, contexts)]
+        gen_kwargs = {
+            "max_length": 200,
+            "min_length": 30,
+            "num_return_sequences": 1,
+            "truncation": True,
+            **self._sampling_kwargs()
+        }
         
-        for question in questions:
-            try:
-                if self.qa_pipeline is None:
+        for start in range(0, len(questions), QA_BATCH_SIZE):
+            batch = list(zip(questions[start:start + QA_BATCH_SIZE], prompts[start:start + QA_BATCH_SIZE]))
+            if self._out_of_time():
+                self._mark_incomplete("questions")
+                for question, _ in batch:
                     answers[question] = {
-                        'answer': 'Q&A pipeline not available - using fallback',
-                        'method': 'Fallback',
+                        'answer': 'Skipped - latency budget exhausted',
+                        'method': 'Skipped',
                         'processed_securely': True
                     }
-                    continue
-                
-                prompt = f"question: {question} context: {text[:1000]}"
-                
-                answer_result = self.qa_pipeline(
-                    prompt,
-                    max_length=200,
-                    min_length=30,
-                    do_sample=True,
-                    temperature=0.7,
-                    num_return_sequences=1
-                )
-                
-                answer = answer_result[0]['generated_text']
-                answer = re.sub(r'^(answer:|Answer:)', '', answer).strip()
-                
-                answers[question] = {
-                    'answer': answer,
-                    'method': 'Local_T5',
-                    'processed_securely': True
-                }
-                
-            except Exception as e:
+                continue
+            
+            try:
+                outputs = self.qa_pipeline([prompt for _, prompt in batch], batch_size=len(batch), **gen_kwargs)
+                for (question, _), output in zip(batch, outputs):
+                    answers[question] = self._parse_answer(output)
+            except Exception as batch_error:
+                print(f"Error answering questions {start}-{start + len(batch) - 1}: {batch_error}")
+                for question, prompt in batch:
+                    try:
+                        answers[question] = self._parse_answer(self.qa_pipeline(prompt, **gen_kwargs)[0])
+                    except Exception as e:
+                        self._mark_incomplete("questions", "Question answering failed")
+                        answers[question] = {
+                            'answer': 'Unable to process question securely',
+                            'error': str(e),
+                            'method': 'Error'
+                        }
+        
+        return answers
+
+    def _answer_questions_extractive(self, questions, text):
+        """Answer each question with the best-scoring sentence span of its retrieved passages"""
+        answers = {}
+        try:
+            question_set = question_set_registry.resolve(questions)
+            contexts = self._question_contexts(questions, text)
+            embedder = load_embedder()
+            question_embeddings = question_set.embeddings(embedder, EMBEDDING_MODEL_NAME, embed_texts)
+            spans = answer_spans(contexts, question_set.ranking_terms(self.stop_words), question_embeddings, embedder,
+                                 embed_texts, self.stop_words)
+        except Exception as e:
+            print(f"Error in extractive Q&A: {e}")
+            self._mark_incomplete("questions", "Extractive Q&A failed")
+            for question in questions:
                 answers[question] = {
                     'answer': 'Unable to process question securely',
                     'error': str(e),
                     'method': 'Error'
                 }
-        
+            return answers
+        
+        for question, (span, confidence) in zip(questions, spans):
+            answers[question] = {
+                'answer': span or 'No relevant passage found in the document.',
+                'method': 'Local_Extractive',
+                'processed_securely': True,
+                'confidence': confidence
+            }
         return answers
+
+    def _parse_answer(self, output):
+        """Per-question answer record from one Q&A pipeline output"""
+        answer = re.sub(r'^(answer:|Answer:)', '', output['generated_text']).strip()
+        return {
+            'answer': answer,
+            'method': 'Local_T5',
+            'processed_securely': True
+        }
     
     def get_annotation(self, sample_text, sample_context):
         """Generate annotations using biomed_annotator"""
@@ -1264,11 +1847,20 @@ class HIPAACompliantThesisAnalyzer:
         """Clean up session data securely"""
         self.hipaa_logger.log_access(self.user_id, "SESSION_END", "THESIS_ANALYZER")
         
+        # Remove downloads that were hashed but never extracted (e.g. result cache hits)
+        for temp_pdf_path, _ in self._downloads.values():
+            try:
+                os.unlink(temp_pdf_path)
+            except Exception as e:
+                print(f"Warning: Could not delete temporary file: {e}")
+        self._downloads = {}
+        
         # Clear sensitive data from memory
         self.thesis_text = ""
         self.extracted_images = []
         self.ocr_results = []
         self.image_descriptions = []
+        self.image_triage = TriageStats()
         
         # Clear model cache if needed
         if hasattr(torch.cuda, 'empty_cache'):
@@ -1286,6 +1878,14 @@ class AnalyzeReq(BaseModel):
     password:str
     useEncryption: bool =False
     model_name: Optional[str] = "t5-small"
+    precision: Optional[str] = None  # 'fp32' or 'int8'; None = deployment default
+    summary_token_budget: Optional[int] = None  # tokens summarized abstractively; 0 = all, None = deployment default
+    max_latency_ms: Optional[int] = None  # plan the work to finish within this budget; partial results are flagged
+    summary_mode: Optional[str] = None  # 'recursive' or 'sections'; None = deployment default
+    questions: Optional[List[str]] = None  # custom questions; take precedence over question_set
+    question_set: Optional[str] = None  # named question set; None = default thesis questions
+    qa_mode: Optional[str] = None  # 'generative' or 'extractive' (fast span answers); None = deployment default
+    deterministic: Optional[bool] = None  # greedy summary/answers; None = deployment default; False skips the result cache
 
 @app.post('/get_summary')
 def get_summary(req: AnalyzeReq):
@@ -1295,12 +1895,20 @@ def get_summary(req: AnalyzeReq):
             user_id=req.userId,
             password=req.password,
             session_timeout=30,
-            model_name=req.model_name
+            model_name=req.model_name,
+            precision=req.precision,
+            summary_token_budget=req.summary_token_budget,
+            max_latency_ms=req.max_latency_ms,
+            summary_mode=req.summary_mode,
+            qa_mode=req.qa_mode,
+            deterministic=req.deterministic
         )
         
         report = analyzer.process_summary_only(
             pdf_path=req.storageKey,
-            output_file="hipaa_summary_only"
+            output_file="hipaa_summary_only",
+            use_ocr=req.ocr,
+            use_blip=req.blip
         )
         
         analyzer.cleanup_session()
@@ -1309,6 +1917,54 @@ def get_summary(req: AnalyzeReq):
         print(f"Error in get_summary: {e}")
         return {"error": str(e)}
 
+@app.post('/get_summary_stream')
+def get_summary_stream(req: AnalyzeReq):
+    """Summary as NDJSON progress events: extraction status, each chunk summary, then the report"""
+    events = queue.Queue()
+
+    def run():
+        try:
+            analyzer = HIPAACompliantThesisAnalyzer(
+                user_id=req.userId,
+                password=req.password,
+                session_timeout=30,
+                model_name=req.model_name,
+                precision=req.precision,
+                summary_token_budget=req.summary_token_budget,
+                max_latency_ms=req.max_latency_ms,
+                summary_mode=req.summary_mode,
+                qa_mode=req.qa_mode,
+                deterministic=req.deterministic
+            )
+            analyzer.progress_callback = events.put
+            events.put({"event": "model_ready", "model_name": analyzer.model_name})
+
+            report = analyzer.process_summary_only(
+                pdf_path=req.storageKey,
+                output_file="hipaa_summary_only",
+                use_ocr=req.ocr,
+                use_blip=req.blip
+            )
+            analyzer.cleanup_session()
+            events.put({"event": "summary", "report": report})
+        except Exception as e:
+            print(f"Error in get_summary_stream: {e}")
+            events.put({"event": "error", "error": str(e)})
+        finally:
+            events.put(None)
+
+    def stream():
+        # First byte goes out before model loading and extraction start
+        yield json.dumps({"event": "accepted"}) + "\n"
+        while True:
+            event = events.get()
+            if event is None:
+                break
+            yield json.dumps(event) + "\n"
+
+    threading.Thread(target=run, daemon=True).start()
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
 @app.post('/get_answer')
 def get_answer(req: AnalyzeReq):
     """Get answers only"""
@@ -1317,16 +1973,24 @@ def get_answer(req: AnalyzeReq):
             user_id=req.userId,
             password=req.password,
             session_timeout=30,
-            model_name=req.model_name
+            model_name=req.model_name,
+            precision=req.precision,
+            summary_token_budget=req.summary_token_budget,
+            max_latency_ms=req.max_latency_ms,
+            summary_mode=req.summary_mode,
+            qa_mode=req.qa_mode,
+            deterministic=req.deterministic
         )
         
-        # Use questions from separate file
-        questions = THESIS_QUESTIONS
+        # Custom questions, a named set, or the default questions from questions.py
+        questions = list(question_set_registry.resolve(req.questions, req.question_set).questions)
         
         report = analyzer.process_questions_only(
             pdf_path=req.storageKey,
             questions=questions,
-            output_file="hipaa_answers_only"
+            output_file="hipaa_answers_only",
+            use_ocr=req.ocr,
+            use_blip=req.blip
         )
         
         analyzer.cleanup_session()
@@ -1344,91 +2008,15 @@ async def upload_db(upload_db: str = Form(...), pdf_file: UploadFile = File(...)
     conn = None
     try:
         # 1. Extract content (Text + Images)
-        text_content = ""
-        ocr_text_content = ""
         combined_text = ""
         
         try:
             # Read stream from UploadFile
             pdf_stream = await pdf_file.read()
-                
-            # Use PyMuPDF with the stream
-            doc = fitz.open(stream=pdf_stream, filetype="pdf")
             
-            extracted_text = []
-            extracted_images = []
-            
-            for page_num, page in enumerate(doc):
-                # Extract text
-                page_text = page.get_text()
-                extracted_text.append(page_text)
-                
-                # Extract images
-                image_list = page.get_images()
-                for img_index, img in enumerate(image_list):
-                    try:
-                        xref = img[0]
-                        pix = fitz.Pixmap(doc, xref)
-                        
-                        # Handle CMYK / Alpha - convert if needed
-                        if pix.n - pix.alpha < 4: # RGB or Gray
-                            pass 
-                        else: # CMYK: convert to RGB
-                            pix = fitz.Pixmap(fitz.csRGB, pix)
-
-                        img_data = pix.tobytes("ppm")
-                        img_pil = Image.open(io.BytesIO(img_data))
-                        
-                        extracted_images.append({
-                            'page': page_num + 1,
-                            'index': img_index,
-                            'image': img_pil
-                        })
-                        pix = None
-                    except Exception as e:
-                        print(f"Error extracting image {img_index} on page {page_num}: {e}")
-            
-            text_content = "\n".join(extracted_text)
-            doc.close()
-
-            # 2. Perform OCR on extracted images
-            if extracted_images:
-                print(f"Performing OCR on {len(extracted_images)} images...")
-                for img_info in extracted_images:
-                    try:
-                        img = img_info['image']
-                        if img.mode != 'RGB':
-                            img = img.convert('RGB')
-                        
-                        # Preprocess (using logic similar to _perform_secure_ocr)
-                        processed_img = img 
-                        
-                        if OPENCV_AVAILABLE:
-                            img_array = np.array(img)
-                            gray = cv2.cvtColor(img_array, cv2.COLOR_RGB2GRAY)
-                            denoised = cv2.medianBlur(gray, 3)
-                            clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8,8))
-                            enhanced = clahe.apply(denoised)
-                            _, thresh = cv2.threshold(enhanced, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-                            processed_img = Image.fromarray(thresh)
-                        else:
-                            gray = img.convert('L')
-                            enhancer = ImageEnhance.Contrast(gray)
-                            enhanced = enhancer.enhance(2.0)
-                            processed_img = enhanced.filter(ImageFilter.SHARPEN)
-                            
-                        # OCR
-                        ocr_result = pytesseract.image_to_string(processed_img, config='--psm 6')
-                        if ocr_result.strip():
-                            ocr_text_content += f" {ocr_result.strip()}"
-                            
-                    except Exception as e:
-                        print(f"OCR failed for image {img_info['index']}: {e}")
-
-            # 3. Combine Text
-            combined_text = text_content + "\n" + ocr_text_content
-            # Clean up whitespace
-            combined_text = re.sub(r'\s+', ' ', combined_text).strip()
+            # Text + OCR of embedded images, streamed page by page
+            extraction_result = extract_content_from_pdf_stream(pdf_stream)
+            combined_text = extraction_result["combined_text"]
 
         except Exception as e:
             print(f"Error extracting PDF content: {e}")
@@ -1467,7 +2055,9 @@ async def upload_db(upload_db: str = Form(...), pdf_file: UploadFile = File(...)
             return {
                 "status": "success", 
                 "message": "Content updated in database",
-                "db_id": updated_id
+                "db_id": updated_id,
+                "images_processed": extraction_result["images_count"],
+                "image_triage": extraction_result["image_triage"]
             }
             
         except psycopg2.Error as e:
@@ -1490,92 +2080,55 @@ class ExtractFromUrlRequest(BaseModel):
     verify_ssl: Optional[bool] = None  # None = auto-detect (disabled for localhost)
 
 
-def extract_content_from_pdf_stream(pdf_stream: bytes) -> dict:
+def extract_content_from_pdf_stream(pdf_stream: bytes, secure_handler: Optional[SecureFileHandler] = None) -> dict:
     """
     Extract text and images with OCR from a PDF byte stream.
     
     Args:
         pdf_stream: PDF file content as bytes
+        secure_handler: Password-backed handler for the image artifact cache's disk tier;
+            without one, OCR text is cached in memory only and never written to disk
         
     Returns:
         dict with text_content, ocr_text_content, combined_text, extracted_images count
     """
-    text_content = ""
+    page_texts = []
     ocr_text_content = ""
-    combined_text = ""
-    extracted_images = []
-    
-    # Use PyMuPDF with the stream
-    doc = fitz.open(stream=pdf_stream, filetype="pdf")
+    images_count = 0
+    deduplicator = ImageDeduplicator()
+    triage = TriageStats()
+    pending = []
     
-    extracted_text = []
+    def flush():
+        nonlocal ocr_text_content
+        texts, _ = ocr_with_cache(pending, secure_handler)
+        for img_info, ocr_result in zip(pending, texts):
+            if isinstance(ocr_result, Exception):
+                print(f"OCR failed for image {img_info['index']}: {ocr_result}")
+            elif ocr_result:
+                ocr_text_content += f" {ocr_result}"
+        pending.clear()
     
-    for page_num, page in enumerate(doc):
-        # Extract text
-        page_text = page.get_text()
-        extracted_text.append(page_text)
-        
-        # Extract images
-        image_list = page.get_images()
-        for img_index, img in enumerate(image_list):
-            try:
-                xref = img[0]
-                pix = fitz.Pixmap(doc, xref)
-                
-                # Handle CMYK / Alpha - convert if needed
-                if pix.n - pix.alpha < 4:  # RGB or Gray
-                    pass 
-                else:  # CMYK: convert to RGB
-                    pix = fitz.Pixmap(fitz.csRGB, pix)
-
-                img_data = pix.tobytes("ppm")
-                img_pil = Image.open(io.BytesIO(img_data))
-                
-                extracted_images.append({
-                    'page': page_num + 1,
-                    'index': img_index,
-                    'image': img_pil
-                })
-                pix = None
-            except Exception as e:
-                print(f"Error extracting image {img_index} on page {page_num}: {e}")
+    # Pages are streamed; unique images are OCR'd in batches and released after their batch
+    for record in iter_pages(pdf_stream):
+        page_texts.append(record.text)
+        for image_ref in record.images:
+            key, img_info, is_new = deduplicator.resolve(image_ref)
+            if key is None:
+                continue
+            images_count += 1
+            if not is_new:
+                # Reused image (logo, banner, watermark): already OCR'd
+                continue
+            if not triage.keep(img_info['image']):
+                # Icon, rule, gradient or blank mask
+                continue
+            pending.append(img_info)
+        if len(pending) >= OCR_BATCH_IMAGES:
+            flush()
+    flush()
     
-    text_content = "\n".join(extracted_text)
-    doc.close()
-
-    # Perform OCR on extracted images
-    if extracted_images:
-        print(f"Performing OCR on {len(extracted_images)} images...")
-        for img_info in extracted_images:
-            try:
-                img = img_info['image']
-                if img.mode != 'RGB':
-                    img = img.convert('RGB')
-                
-                # Preprocess
-                processed_img = img 
-                
-                if OPENCV_AVAILABLE:
-                    img_array = np.array(img)
-                    gray = cv2.cvtColor(img_array, cv2.COLOR_RGB2GRAY)
-                    denoised = cv2.medianBlur(gray, 3)
-                    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8,8))
-                    enhanced = clahe.apply(denoised)
-                    _, thresh = cv2.threshold(enhanced, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-                    processed_img = Image.fromarray(thresh)
-                else:
-                    gray = img.convert('L')
-                    enhancer = ImageEnhance.Contrast(gray)
-                    enhanced = enhancer.enhance(2.0)
-                    processed_img = enhanced.filter(ImageFilter.SHARPEN)
-                    
-                # OCR
-                ocr_result = pytesseract.image_to_string(processed_img, config='--psm 6')
-                if ocr_result.strip():
-                    ocr_text_content += f" {ocr_result.strip()}"
-                    
-            except Exception as e:
-                print(f"OCR failed for image {img_info['index']}: {e}")
+    text_content = join_page_text(page_texts)
 
     # Combine Text
     combined_text = text_content + "\n" + ocr_text_content
@@ -1586,7 +2139,8 @@ def extract_content_from_pdf_stream(pdf_stream: bytes) -> dict:
         "text_content": text_content,
         "ocr_text_content": ocr_text_content,
         "combined_text": combined_text,
-        "images_count": len(extracted_images)
+        "images_count": images_count,
+        "image_triage": triage.report()
     }
 
 
@@ -1653,7 +2207,8 @@ async def extract_content(req: ExtractFromUrlRequest):
                 "text_length": len(extraction_result["text_content"]),
                 "ocr_text_length": len(extraction_result["ocr_text_content"]),
                 "combined_length": len(extraction_result["combined_text"]),
-                "images_processed": extraction_result["images_count"]
+                "images_processed": extraction_result["images_count"],
+                "image_triage": extraction_result["image_triage"]
             }
         }
         
@@ -1681,20 +2236,28 @@ def analyze(req: AnalyzeReq):
             password=req.password,
             session_timeout=30,
             model_name=req.model_name,
-            mode="analyze"
+            mode="analyze",
+            precision=req.precision,
+            summary_token_budget=req.summary_token_budget,
+            max_latency_ms=req.max_latency_ms,
+            summary_mode=req.summary_mode,
+            qa_mode=req.qa_mode,
+            deterministic=req.deterministic
         )
         
         pdf_path = req.storageKey
 
-        # Use questions from separate file
-        questions = THESIS_QUESTIONS
+        # Custom questions, a named set, or the default questions from questions.py
+        questions = list(question_set_registry.resolve(req.questions, req.question_set).questions)
         
         # Process document securely
         print("\nProcessing document with HIPAA compliance...")
         report = analyzer.process_document_securely(
             pdf_path=pdf_path,
             questions=questions,
-            output_file="hipaa_compliant_analysis"
+            output_file="hipaa_compliant_analysis",
+            use_ocr=req.ocr,
+            use_blip=req.blip
         )
         
         print("\n" + "="*60)
@@ -0,0 +1,78 @@
+import os
+
+from result_cache import ResultCache, make_cache_key
+from pdf_extraction import image_content_hash
+from ocr_pool import ocr_images, ocr_settings
+from model_registry import BLIP_MODEL_NAME
+
+# --- 1. Configuration ---
+
+IMAGE_ARTIFACT_CACHE_ENABLED = os.getenv("IMAGE_ARTIFACT_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+IMAGE_ARTIFACT_CACHE_TTL_S = int(os.getenv("IMAGE_ARTIFACT_CACHE_TTL_S", 30 * 24 * 3600))
+IMAGE_ARTIFACT_CACHE_MAX_ENTRIES = int(os.getenv("IMAGE_ARTIFACT_CACHE_MAX_ENTRIES", 4096))  # in-memory tier
+IMAGE_ARTIFACT_CACHE_MAX_MB = int(os.getenv("IMAGE_ARTIFACT_CACHE_MAX_MB", 256))  # on-disk tier
+
+# Caption generation settings; part of every caption key
+BLIP_GENERATION = {"max_length": 100, "num_beams": 5}
+
+# OCR text and BLIP captions keyed by decoded pixel hash, shared across documents,
+# so a journal template or publisher logo is processed once per deployment
+image_artifact_cache = ResultCache(
+    "image_artifacts",
+    ttl_s=IMAGE_ARTIFACT_CACHE_TTL_S,
+    max_entries=IMAGE_ARTIFACT_CACHE_MAX_ENTRIES,
+    max_disk_mb=IMAGE_ARTIFACT_CACHE_MAX_MB
+)
+
+
+def _content_hash(img_info):
+    return img_info.get('content_hash') or image_content_hash(img_info['image'])
+
+
+def ocr_artifact_key(img_info, engine=None):
+    return make_cache_key(kind="ocr", image=_content_hash(img_info), ocr=ocr_settings(engine))
+
+
+def caption_artifact_key(img_info, precision):
+    return make_cache_key(kind="caption", image=_content_hash(img_info), model=BLIP_MODEL_NAME,
+                          precision=precision, generation=BLIP_GENERATION)
+
+
+def get_caption(img_info, precision, secure_handler=None):
+    """Cached caption for an image record, or None"""
+    if not IMAGE_ARTIFACT_CACHE_ENABLED:
+        return None
+    cached = image_artifact_cache.get(caption_artifact_key(img_info, precision), secure_handler)
+    return cached["caption"] if cached is not None else None
+
+
+def put_caption(img_info, precision, caption, secure_handler=None):
+    if IMAGE_ARTIFACT_CACHE_ENABLED:
+        image_artifact_cache.put(caption_artifact_key(img_info, precision), {"caption": caption}, secure_handler)
+
+
+def ocr_with_cache(images, secure_handler=None):
+    """OCR text (or the exception raised) for each image record, in order, plus the number of cache hits.
+
+    Images whose pixels were OCR'd before under the same preprocessing and
+    Tesseract settings never reach Tesseract; the rest go through the OCR
+    pool and successful results are cached under the engine that actually
+    produced them. Entries go to disk, encrypted, only when the
+    SecureFileHandler has a password.
+    """
+    if not IMAGE_ARTIFACT_CACHE_ENABLED:
+        return [text for text, _ in ocr_images([img_info['image'] for img_info in images])], 0
+
+    keys = [ocr_artifact_key(img_info) for img_info in images]
+    results = [None] * len(images)
+    for i, key in enumerate(keys):
+        cached = image_artifact_cache.get(key, secure_handler)
+        if cached is not None:
+            results[i] = cached["ocr_text"]
+
+    missing = [i for i, result in enumerate(results) if result is None]
+    for i, (text, engine) in zip(missing, ocr_images([images[i]['image'] for i in missing])):
+        results[i] = text
+        if not isinstance(text, Exception):
+            image_artifact_cache.put(ocr_artifact_key(images[i], engine), {"ocr_text": text}, secure_handler)
+    return results, len(images) - len(missing)
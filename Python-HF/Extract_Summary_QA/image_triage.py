@@ -0,0 +1,120 @@
+import os
+from collections import Counter
+
+import numpy as np
+
+# --- 1. Configuration ---
+
+IMAGE_TRIAGE_ENABLED = os.getenv("IMAGE_TRIAGE_ENABLED", "true").lower() in ("1", "true", "yes")
+# Icons and bullets: either side below this many pixels
+IMAGE_TRIAGE_MIN_SIDE = int(os.getenv("IMAGE_TRIAGE_MIN_SIDE", 32))
+# Rules and separators: long side / short side above this
+IMAGE_TRIAGE_MAX_ASPECT = float(os.getenv("IMAGE_TRIAGE_MAX_ASPECT", 15.0))
+# Blank masks and flat fills: grayscale standard deviation below this (0-255 scale)
+IMAGE_TRIAGE_MIN_STD = float(os.getenv("IMAGE_TRIAGE_MIN_STD", 6.0))
+# Near-uniform images: histogram entropy below this many bits. Only applied to images
+# that also fail the edge check, since bilevel scans (text, equations, line art) have at
+# most 1 bit and sparse ink on white much less
+IMAGE_TRIAGE_MIN_ENTROPY = float(os.getenv("IMAGE_TRIAGE_MIN_ENTROPY", 0.5))
+# Smooth images without strokes: share of pixels with a strong neighbour step below this
+IMAGE_TRIAGE_MIN_EDGE_DENSITY = float(os.getenv("IMAGE_TRIAGE_MIN_EDGE_DENSITY", 0.005))
+# Intensity step that counts as an edge
+IMAGE_TRIAGE_EDGE_STEP = int(os.getenv("IMAGE_TRIAGE_EDGE_STEP", 40))
+# Images are measured on a grayscale thumbnail with this longest side
+IMAGE_TRIAGE_SAMPLE_SIDE = int(os.getenv("IMAGE_TRIAGE_SAMPLE_SIDE", 256))
+
+
+def triage_settings():
+    """Thresholds in effect; part of the result cache key because skipped images add no OCR text"""
+    if not IMAGE_TRIAGE_ENABLED:
+        return None
+    return {
+        "min_side": IMAGE_TRIAGE_MIN_SIDE,
+        "max_aspect": IMAGE_TRIAGE_MAX_ASPECT,
+        "min_std": IMAGE_TRIAGE_MIN_STD,
+        "min_entropy": IMAGE_TRIAGE_MIN_ENTROPY,
+        "min_edge_density": IMAGE_TRIAGE_MIN_EDGE_DENSITY,
+        "edge_step": IMAGE_TRIAGE_EDGE_STEP,
+        "sample_side": IMAGE_TRIAGE_SAMPLE_SIDE
+    }
+
+
+# --- 2. Scoring ---
+
+def image_features(image):
+    """Size, aspect ratio, pixel spread, histogram entropy and edge density of a PIL image"""
+    width, height = image.size
+    sample = image.convert('L')
+    if max(width, height) > IMAGE_TRIAGE_SAMPLE_SIDE:
+        sample.thumbnail((IMAGE_TRIAGE_SAMPLE_SIDE, IMAGE_TRIAGE_SAMPLE_SIDE))
+    pixels = np.asarray(sample, dtype=np.int16)
+
+    histogram = np.bincount(pixels.ravel(), minlength=256).astype(np.float64)
+    p = histogram[histogram > 0] / pixels.size
+    entropy = float(-(p * np.log2(p)).sum())
+
+    # Strong steps between horizontal and vertical neighbours; text strokes produce many
+    steps = 0
+    if pixels.shape[1] > 1:
+        steps += int((np.abs(np.diff(pixels, axis=1)) >= IMAGE_TRIAGE_EDGE_STEP).sum())
+    if pixels.shape[0] > 1:
+        steps += int((np.abs(np.diff(pixels, axis=0)) >= IMAGE_TRIAGE_EDGE_STEP).sum())
+
+    return {
+        "width": width,
+        "height": height,
+        "aspect": max(width, height) / max(min(width, height), 1),
+        "std": float(pixels.std()),
+        "entropy": entropy,
+        "edge_density": steps / (2 * pixels.size)
+    }
+
+
+def triage_image(image):
+    """(keep, reason, features): reason names the first failed check of a skipped image.
+    Checks run cheapest first, so tiny and very thin images are never sampled."""
+    width, height = image.size
+    if min(width, height) < IMAGE_TRIAGE_MIN_SIDE:
+        return False, "too_small", {"width": width, "height": height}
+    if max(width, height) / max(min(width, height), 1) > IMAGE_TRIAGE_MAX_ASPECT:
+        return False, "extreme_aspect", {"width": width, "height": height}
+
+    features = image_features(image)
+    if features["std"] < IMAGE_TRIAGE_MIN_STD:
+        return False, "low_variance", features
+    # Strokes are the best text signal; an image with enough edges is kept whatever its entropy
+    if features["edge_density"] >= IMAGE_TRIAGE_MIN_EDGE_DENSITY:
+        return True, None, features
+    if features["entropy"] < IMAGE_TRIAGE_MIN_ENTROPY:
+        return False, "low_entropy", features
+    return False, "low_edge_density", features
+
+
+class TriageStats:
+    """Per-document triage counts reported under image_analysis"""
+
+    def __init__(self):
+        self.checked = 0
+        self.skipped = Counter()
+
+    def keep(self, image):
+        """Triage one image and record the outcome; everything is kept when triage is off"""
+        if not IMAGE_TRIAGE_ENABLED:
+            return True
+        self.checked += 1
+        try:
+            keep, reason, _ = triage_image(image)
+        except Exception as e:
+            print(f"Image triage failed, keeping image: {e}")
+            return True
+        if not keep:
+            self.skipped[reason] += 1
+        return keep
+
+    def report(self):
+        return {
+            "enabled": IMAGE_TRIAGE_ENABLED,
+            "unique_images_checked": self.checked,
+            "images_skipped": sum(self.skipped.values()),
+            "skipped_by_reason": dict(self.skipped)
+        }
@@ -0,0 +1,71 @@
+import os
+import time
+
+from model_registry import MODEL_CONFIGS
+
+# --- 1. Configuration ---
+
+# Approximate map-stage cost of one chunk for a relative_cost 1 model (t5-small on CPU)
+LATENCY_CHUNK_COST_MS = int(os.getenv("LATENCY_CHUNK_COST_MS", 1500))
+# Share of the budget kept for extraction, the final summary pass and the report
+LATENCY_RESERVED_SHARE = float(os.getenv("LATENCY_RESERVED_SHARE", 0.4))
+# Below this many affordable chunks the cheapest configured model is used instead
+LATENCY_MIN_CHUNKS = int(os.getenv("LATENCY_MIN_CHUNKS", 4))
+# Budgets under which OCR / BLIP are skipped, and under which output lengths shrink
+LATENCY_OCR_MIN_MS = int(os.getenv("LATENCY_OCR_MIN_MS", 30000))
+LATENCY_BLIP_MIN_MS = int(os.getenv("LATENCY_BLIP_MIN_MS", 60000))
+LATENCY_TIGHT_MS = int(os.getenv("LATENCY_TIGHT_MS", 15000))
+
+
+class Deadline:
+    """Wall-clock deadline measured from construction"""
+
+    def __init__(self, budget_ms):
+        self.budget_ms = budget_ms
+        self.started = time.monotonic()
+
+    def elapsed_ms(self):
+        return int((time.monotonic() - self.started) * 1000)
+
+    def remaining_ms(self):
+        return self.budget_ms - self.elapsed_ms()
+
+    def expired(self, reserve_ms=0):
+        """True once less than reserve_ms of the budget is left"""
+        return self.remaining_ms() <= reserve_ms
+
+
+def _chunk_cost_ms(model_name, model_configs):
+    return LATENCY_CHUNK_COST_MS * model_configs.get(model_name, {}).get("relative_cost", 1)
+
+
+def plan_latency_budget(max_latency_ms, model_name, model_configs=MODEL_CONFIGS):
+    """Choose model, chunk count, generation limits and image stages that fit max_latency_ms.
+
+    The requested model is kept when it can summarize at least
+    LATENCY_MIN_CHUNKS chunks in the map share of the budget; otherwise the
+    cheapest model in model_configs is used. Decoding is greedy with a
+    single beam, and OCR/BLIP are only allowed above their minimum budgets.
+    """
+    map_ms = max_latency_ms * (1 - LATENCY_RESERVED_SHARE)
+    chosen = model_name
+    chunk_ms = _chunk_cost_ms(chosen, model_configs)
+    if map_ms // chunk_ms < LATENCY_MIN_CHUNKS:
+        chosen = min(model_configs, key=lambda name: model_configs[name].get("relative_cost", 1))
+        chunk_ms = _chunk_cost_ms(chosen, model_configs)
+
+    tight = max_latency_ms < LATENCY_TIGHT_MS
+    return {
+        "requested_model": model_name,
+        "model_name": chosen,
+        "max_chunks": max(1, int(map_ms // chunk_ms)),
+        "map_max_length": 80 if tight else 150,
+        "final_max_length": 150 if tight else 300,
+        "final_min_length": 40 if tight else 100,
+        "do_sample": False,
+        "num_beams": 1,
+        "ocr": max_latency_ms >= LATENCY_OCR_MIN_MS,
+        "blip": max_latency_ms >= LATENCY_BLIP_MIN_MS,
+        # A final pass over merged summaries costs about two map-stage chunks
+        "final_reserve_ms": int(chunk_ms * 2)
+    }
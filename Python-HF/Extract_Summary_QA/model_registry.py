@@ -0,0 +1,432 @@
+import os
+import copy
+import time
+import threading
+from collections import OrderedDict
+
+import torch
+from PIL import Image
+from transformers import pipeline, BlipProcessor, BlipForConditionalGeneration, AutoTokenizer, AutoModelForSeq2SeqLM
+try:
+    from optimum.onnxruntime import ORTModelForSeq2SeqLM
+    ONNX_AVAILABLE = True
+except ImportError:
+    ONNX_AVAILABLE = False
+try:
+    from sentence_transformers import SentenceTransformer
+    SENTENCE_TRANSFORMERS_AVAILABLE = True
+except ImportError:
+    SENTENCE_TRANSFORMERS_AVAILABLE = False
+
+# --- 1. Configuration ---
+
+# Same layout as setup_cache_directories() in hipaathesis.py
+HF_CACHE_DIR = os.getenv('HF_HOME', '/app/.cache/huggingface')
+# ONNX exports are kept next to the HF cache and reused across restarts
+ONNX_CACHE_DIR = os.path.join(os.path.dirname(HF_CACHE_DIR), 'onnx')
+BLIP_MODEL_NAME = "Salesforce/blip-image-captioning-base"
+DEFAULT_MODEL_NAME = "t5-small"
+# Sentence embedding model used for passage retrieval
+EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME", "sentence-transformers/all-MiniLM-L6-v2")
+
+# Map model names to their optimal tasks and parameters
+# relative_cost: approximate CPU generate time relative to t5-small, used by latency budget planning
+MODEL_CONFIGS = {
+    "t5-small": {"task": "text2text-generation", "summarizer_task": "summarization", "relative_cost": 1},
+    "t5-base": {"task": "text2text-generation", "summarizer_task": "summarization", "relative_cost": 3},
+    "t5-large": {"task": "text2text-generation", "summarizer_task": "summarization", "relative_cost": 10},
+    "bart-large-cnn": {"task": "text2text-generation", "summarizer_task": "summarization", "relative_cost": 8},
+    "facebook/bart-base": {"task": "text2text-generation", "summarizer_task": "summarization", "relative_cost": 3},
+    "distilbart-cnn-12-6": {"task": "text2text-generation", "summarizer_task": "summarization", "relative_cost": 6},
+    "sshleifer/distilbart-cnn-6-6": {"task": "text2text-generation", "summarizer_task": "summarization", "relative_cost": 4},
+    "pegasus-large": {"task": "text2text-generation", "summarizer_task": "summarization", "relative_cost": 10},
+    "flan-t5-base": {"task": "text2text-generation", "summarizer_task": "summarization", "relative_cost": 3},
+    "flan-t5-large": {"task": "text2text-generation", "summarizer_task": "summarization", "relative_cost": 10}
+}
+
+# Total size of weights kept resident across all cached models (0 = unlimited)
+MODEL_MEMORY_BUDGET_MB = int(os.getenv("MODEL_MEMORY_BUDGET_MB", 4096))
+
+# Comma-separated model names loaded and warmed up at startup ("blip" for the captioner,
+# "embedder" for the retrieval embedding model)
+PRELOAD_MODELS = [name.strip() for name in os.getenv("PRELOAD_MODELS", "").split(",") if name.strip()]
+
+# Inference precision: 'fp32', or 'int8' for dynamically quantized Linear layers on CPU
+SUPPORTED_PRECISIONS = ("fp32", "int8")
+INFERENCE_PRECISION = os.getenv("INFERENCE_PRECISION", "fp32").lower()
+
+# Seq2seq inference backend for this deployment: 'pytorch' or 'onnx' (ONNX Runtime on CPU)
+SUPPORTED_BACKENDS = ("pytorch", "onnx")
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "pytorch").lower()
+
+
+def get_device():
+    """Device shared by every model in the registry"""
+    return torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+
+
+def resolve_precision(precision=None):
+    """Validate a requested precision, falling back to the deployment default.
+
+    Dynamic quantization only has CPU kernels, so int8 resolves to fp32 on GPU.
+    """
+    precision = (precision or INFERENCE_PRECISION).lower()
+    if precision not in SUPPORTED_PRECISIONS:
+        print(f"Unsupported precision '{precision}', using fp32")
+        return "fp32"
+    if precision == "int8" and get_device().type != 'cpu':
+        print("int8 dynamic quantization is CPU-only, using fp32")
+        return "fp32"
+    return precision
+
+
+def resolve_backend(backend=None):
+    """Validate a requested backend, falling back to PyTorch when ORT is unavailable"""
+    backend = (backend or INFERENCE_BACKEND).lower()
+    if backend not in SUPPORTED_BACKENDS:
+        print(f"Unsupported inference backend '{backend}', using pytorch")
+        return "pytorch"
+    if backend == "onnx" and not ONNX_AVAILABLE:
+        print("optimum-onnx[onnxruntime] not available, using pytorch backend")
+        return "pytorch"
+    return backend
+
+
+def quantize_model(model):
+    """Dynamically quantize Linear layers to int8 for CPU inference"""
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def _estimate_dir_bytes(path):
+    """Size of the exported ONNX graphs and weights in a directory"""
+    total = 0
+    for name in os.listdir(path):
+        if name.endswith(('.onnx', '.onnx_data')):
+            total += os.path.getsize(os.path.join(path, name))
+    return total
+
+
+def _estimate_model_bytes(model):
+    """Approximate resident size of a model's weights and buffers.
+
+    Uses the state dict so packed int8 weights of quantized layers are counted.
+    """
+    total = 0
+    for value in model.state_dict().values():
+        tensors = value if isinstance(value, (tuple, list)) else [value]
+        for tensor in tensors:
+            if isinstance(tensor, torch.Tensor):
+                total += tensor.numel() * tensor.element_size()
+    return total
+
+
+# --- 2. Loaded model bundles ---
+
+def build_pipelines(model, tokenizer, device_index):
+    """Summarization and Q&A pipelines sharing one model"""
+    try:
+        summarizer = pipeline(
+            "summarization",
+            model=model,
+            tokenizer=tokenizer,
+            device=device_index,
+            max_length=200,
+            min_length=50,
+            do_sample=True,
+            temperature=0.7
+        )
+
+        qa_pipeline = pipeline(
+            "text2text-generation",
+            model=model,
+            tokenizer=tokenizer,
+            device=device_index,
+            max_length=512,
+            do_sample=True,
+            temperature=0.7
+        )
+        print("Pipelines initialized successfully")
+    except Exception as e:
+        print(f"Error initializing pipelines: {e}")
+        summarizer = None
+        qa_pipeline = None
+    return summarizer, qa_pipeline
+
+
+class Seq2SeqBundle:
+    """Tokenizer, model and pipelines for one seq2seq model.
+
+    The tokenizer and pipelines here are for single-threaded users (warm-up,
+    worker processes). Fast tokenizers raise "Already borrowed" when threads
+    call them with different truncation settings, so request handlers take
+    their own copies through for_request() and share only the model weights.
+    """
+
+    def __init__(self, model_name, tokenizer, model, summarizer, qa_pipeline, device, precision="fp32", backend="pytorch"):
+        self.model_name = model_name
+        self.tokenizer = tokenizer
+        self.model = model
+        self.summarizer = summarizer
+        self.qa_pipeline = qa_pipeline
+        self.device = device
+        self.precision = precision
+        self.backend = backend
+        self._tokenizer_lock = threading.Lock()
+
+    def for_request(self):
+        """(tokenizer, summarizer, qa_pipeline) for one request: a private tokenizer copy
+        and pipelines built around it, running the shared model"""
+        with self._tokenizer_lock:
+            tokenizer = copy.deepcopy(self.tokenizer)
+        device_index = 0 if self.device.type == 'cuda' else -1
+        summarizer, qa_pipeline = build_pipelines(self.model, tokenizer, device_index)
+        return tokenizer, summarizer, qa_pipeline
+
+
+class BlipBundle:
+    """Processor and model for the BLIP image captioner"""
+
+    def __init__(self, model_name, processor, model, device, precision="fp32"):
+        self.model_name = model_name
+        self.processor = processor
+        self.model = model
+        self.device = device
+        self.precision = precision
+
+
+# --- 3. Registry ---
+
+class ModelRegistry:
+    """Process-wide cache of loaded models with LRU eviction; lookups and loads are thread-safe.
+
+    Every request asking for the same model gets the same weights (and, through
+    Seq2SeqBundle.for_request, its own tokenizer and pipelines). When the
+    estimated size of resident models exceeds the memory budget, the least
+    recently used models are dropped. Requests still holding a reference to an
+    evicted bundle keep working; its memory is released once they finish.
+    """
+
+    def __init__(self, memory_budget_mb=MODEL_MEMORY_BUDGET_MB, cache_dir=HF_CACHE_DIR):
+        self.memory_budget_bytes = memory_budget_mb * 1024 * 1024
+        self.cache_dir = cache_dir
+        self._entries = OrderedDict()  # key -> (bundle, size_bytes)
+        self._lock = threading.Lock()
+        self._load_locks = {}
+        self._ready = threading.Event()
+        self.preload_status = {}
+
+    def get_seq2seq(self, model_name, precision=None, backend=None):
+        """Return the shared bundle for a seq2seq model, loading it on first use"""
+        backend = resolve_backend(backend)
+        precision = resolve_precision(precision)
+        if backend == "onnx" and precision != "fp32":
+            print("Dynamic int8 quantization applies to the pytorch backend only, using fp32 ONNX")
+            precision = "fp32"
+        try:
+            return self._get(("seq2seq", model_name, precision, backend),
+                             lambda: self._load_seq2seq(model_name, precision, backend))
+        except Exception as e:
+            # Fallback to t5-small if requested model fails
+            if model_name == DEFAULT_MODEL_NAME:
+                raise e
+            print(f"Failed to load {model_name}: {e}")
+            print(f"Falling back to {DEFAULT_MODEL_NAME}...")
+            return self.get_seq2seq(DEFAULT_MODEL_NAME, precision, backend)
+
+    def get_blip(self, precision=None):
+        """Return the shared BLIP captioning bundle, loading it on first use"""
+        precision = resolve_precision(precision)
+        return self._get(("blip", BLIP_MODEL_NAME, precision, "pytorch"), lambda: self._load_blip(precision))
+
+    def get_embedder(self):
+        """Return the shared sentence embedding model, loading it on first use"""
+        if not SENTENCE_TRANSFORMERS_AVAILABLE:
+            raise RuntimeError("sentence-transformers is not installed")
+        return self._get(("embedder", EMBEDDING_MODEL_NAME, "fp32", "pytorch"), self._load_embedder)
+
+    def preload(self, model_names):
+        """Load and warm up each model, then mark preloading finished.
+
+        Failures, and seq2seq models that fell back to DEFAULT_MODEL_NAME, are
+        recorded in preload_status rather than raised; the registry reports
+        ready only when every configured model was loaded as requested.
+        """
+        for name in model_names:
+            start = time.time()
+            self.preload_status[name] = {"status": "loading"}
+            try:
+                if name.lower() in ("blip", BLIP_MODEL_NAME.lower()):
+                    self.warm_up_blip(self.get_blip())
+                elif name.lower() in ("embedder", EMBEDDING_MODEL_NAME.lower()):
+                    self.get_embedder().encode(["The model is warming up."])
+                else:
+                    bundle = self.get_seq2seq(name)
+                    self.warm_up_seq2seq(bundle)
+                    if bundle.model_name != name:
+                        self.preload_status[name] = {"status": "fallback", "served_model": bundle.model_name,
+                                                     "seconds": round(time.time() - start, 2)}
+                        print(f"Preloading {name} fell back to {bundle.model_name}")
+                        continue
+                self.preload_status[name] = {"status": "ready", "seconds": round(time.time() - start, 2)}
+                print(f"Preloaded and warmed up {name} in {time.time() - start:.1f}s")
+            except Exception as e:
+                self.preload_status[name] = {"status": "failed", "error": str(e)}
+                print(f"Preloading {name} failed: {e}")
+        self._ready.set()
+
+    def preload_finished(self):
+        return self._ready.is_set()
+
+    def is_ready(self):
+        """True once preloading finished and every configured model loaded as requested"""
+        return self._ready.is_set() and all(entry["status"] == "ready" for entry in self.preload_status.values())
+
+    def warm_up_seq2seq(self, bundle):
+        """Run a short generate call so the first request skips one-off setup costs"""
+        with bundle._tokenizer_lock:
+            inputs = bundle.tokenizer("summarize: The model is warming up.", return_tensors="pt").to(bundle.device)
+        with torch.no_grad():
+            bundle.model.generate(**inputs, max_new_tokens=8)
+
+    def warm_up_blip(self, bundle):
+        """Caption a blank image once to warm up the BLIP model"""
+        inputs = bundle.processor(Image.new('RGB', (64, 64), 'white'), return_tensors="pt").to(bundle.device)
+        with torch.no_grad():
+            bundle.model.generate(**inputs, max_length=8)
+
+    def is_loaded(self, kind, model_name, precision="fp32", backend="pytorch"):
+        with self._lock:
+            return (kind, model_name, precision, backend) in self._entries
+
+    def evict(self, kind, model_name, precision="fp32", backend="pytorch"):
+        """Drop a model from the registry"""
+        with self._lock:
+            self._entries.pop((kind, model_name, precision, backend), None)
+        if hasattr(torch.cuda, 'empty_cache'):
+            torch.cuda.empty_cache()
+
+    def stats(self):
+        """Resident models and their estimated sizes"""
+        with self._lock:
+            models = [
+                {"kind": kind, "model_name": name, "precision": precision, "backend": backend,
+                 "size_mb": round(size / (1024 * 1024), 1)}
+                for (kind, name, precision, backend), (_, size) in self._entries.items()
+            ]
+        return {
+            "models": models,
+            "total_mb": round(sum(m["size_mb"] for m in models), 1),
+            "budget_mb": self.memory_budget_bytes // (1024 * 1024)
+        }
+
+    def _get(self, key, loader):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key][0]
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        # Load outside the registry lock so other models stay available;
+        # concurrent requests for the same model wait for a single load.
+        with load_lock:
+            with self._lock:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    return self._entries[key][0]
+
+            bundle, size = loader()
+
+            with self._lock:
+                self._entries[key] = (bundle, size)
+                self._load_locks.pop(key, None)
+                self._enforce_budget(keep=key)
+            return bundle
+
+    def _enforce_budget(self, keep):
+        """Evict least recently used models until within budget (caller holds lock)"""
+        if self.memory_budget_bytes <= 0:
+            return
+        evicted = False
+        while sum(size for _, size in self._entries.values()) > self.memory_budget_bytes:
+            victim = next((k for k in self._entries if k != keep), None)
+            if victim is None:
+                break
+            self._entries.pop(victim)
+            evicted = True
+            print(f"Model registry: evicted {victim[1]} ({victim[0]}, {victim[2]}, {victim[3]}) to stay within memory budget")
+        if evicted and hasattr(torch.cuda, 'empty_cache'):
+            torch.cuda.empty_cache()
+
+    def _load_seq2seq(self, model_name, precision="fp32", backend="pytorch"):
+        print(f"Loading {model_name} model ({backend}, {precision}, HIPAA-compliant local processing)...")
+        if backend == "onnx":
+            return self._load_seq2seq_onnx(model_name)
+
+        device = get_device()
+
+        try:
+            # Try to load with explicit cache directory
+            tokenizer = AutoTokenizer.from_pretrained(model_name, cache_dir=self.cache_dir)
+            model = AutoModelForSeq2SeqLM.from_pretrained(model_name, cache_dir=self.cache_dir)
+            print(f"{model_name} loaded successfully from cache")
+        except Exception as e:
+            print(f"Error loading {model_name}: {e}")
+            print("Attempting to load with fallback cache directory...")
+            tokenizer = AutoTokenizer.from_pretrained(model_name)
+            model = AutoModelForSeq2SeqLM.from_pretrained(model_name)
+            print(f"{model_name} loaded with fallback cache")
+
+        model.to(device)
+        model.eval()
+        if precision == "int8":
+            model = quantize_model(model)
+
+        summarizer, qa_pipeline = build_pipelines(model, tokenizer, 0 if torch.cuda.is_available() else -1)
+        bundle = Seq2SeqBundle(model_name, tokenizer, model, summarizer, qa_pipeline, device, precision)
+        return bundle, _estimate_model_bytes(model)
+
+    def _load_seq2seq_onnx(self, model_name):
+        """Export the model to ONNX once, then run it through ONNX Runtime on CPU"""
+        export_dir = os.path.join(ONNX_CACHE_DIR, model_name.replace('/', '--'))
+        if os.path.exists(os.path.join(export_dir, 'config.json')):
+            model = ORTModelForSeq2SeqLM.from_pretrained(export_dir, provider="CPUExecutionProvider")
+            tokenizer = AutoTokenizer.from_pretrained(export_dir)
+            print(f"{model_name} loaded from ONNX export cache")
+        else:
+            print(f"Exporting {model_name} to ONNX (one-time)...")
+            model = ORTModelForSeq2SeqLM.from_pretrained(
+                model_name, export=True, cache_dir=self.cache_dir, provider="CPUExecutionProvider"
+            )
+            tokenizer = AutoTokenizer.from_pretrained(model_name, cache_dir=self.cache_dir)
+            try:
+                os.makedirs(export_dir, exist_ok=True)
+                model.save_pretrained(export_dir)
+                tokenizer.save_pretrained(export_dir)
+                print(f"ONNX export cached at {export_dir}")
+            except Exception as e:
+                print(f"Warning: Could not cache ONNX export: {e}")
+
+        summarizer, qa_pipeline = build_pipelines(model, tokenizer, -1)
+        bundle = Seq2SeqBundle(model_name, tokenizer, model, summarizer, qa_pipeline, torch.device('cpu'), "fp32", "onnx")
+        size = _estimate_dir_bytes(export_dir) if os.path.isdir(export_dir) else 0
+        return bundle, size
+
+    def _load_blip(self, precision="fp32"):
+        device = get_device()
+        processor = BlipProcessor.from_pretrained(BLIP_MODEL_NAME, cache_dir=self.cache_dir)
+        model = BlipForConditionalGeneration.from_pretrained(BLIP_MODEL_NAME, cache_dir=self.cache_dir)
+        model.to(device)
+        model.eval()
+        if precision == "int8":
+            model = quantize_model(model)
+        print(f"BLIP model loaded for local image analysis ({precision})")
+        return BlipBundle(BLIP_MODEL_NAME, processor, model, device, precision), _estimate_model_bytes(model)
+
+    def _load_embedder(self):
+        model = SentenceTransformer(EMBEDDING_MODEL_NAME, device=str(get_device()), cache_folder=self.cache_dir)
+        model.eval()
+        print(f"Embedding model {EMBEDDING_MODEL_NAME} loaded for local retrieval")
+        return model, _estimate_model_bytes(model)
+
+
+model_registry = ModelRegistry()
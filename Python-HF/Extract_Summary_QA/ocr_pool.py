@@ -0,0 +1,176 @@
+import os
+import importlib.util
+from collections import deque
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+import pytesseract
+from PIL import Image, ImageEnhance, ImageFilter
+try:
+    import cv2
+    OPENCV_AVAILABLE = True
+except ImportError:
+    OPENCV_AVAILABLE = False
+
+from worker_pools import WorkerPools
+
+# tesserocr keeps one Tesseract engine loaded per worker instead of starting
+# a tesseract process per image; it is imported in the workers only, after
+# OMP_THREAD_LIMIT is set. Its wheel bundles libtesseract but not language
+# data, which it reads from TESSDATA_PREFIX. Workers that cannot start it, and
+# OCR in the request process, use pytesseract
+TESSEROCR_AVAILABLE = importlib.util.find_spec("tesserocr") is not None
+
+# --- 1. Configuration ---
+
+# Worker processes for OCR (0 = OCR in the request process)
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", 0))
+# OpenMP threads per Tesseract engine; workers x threads should not exceed the cores
+OCR_THREADS_PER_WORKER = int(os.getenv("OCR_THREADS_PER_WORKER", 1))
+# Unique images buffered across pages before a batch is OCR'd and captioned
+OCR_BATCH_IMAGES = int(os.getenv("OCR_BATCH_IMAGES", 8))
+
+TESSERACT_CONFIG = '--psm 6'
+
+_pools = WorkerPools("OCR")
+
+# Set in each worker process by _init_worker when tesserocr is installed
+_tess_api = None
+
+
+def ocr_settings(engine=None):
+    """Preprocessing and engine settings that determine OCR output; part of OCR cache keys.
+    engine defaults to the one configured; pass the engine ocr_images reported for a result."""
+    return {
+        "preprocess": "opencv" if OPENCV_AVAILABLE else "pil",
+        "engine": engine or ("tesserocr" if OCR_WORKERS > 0 and TESSEROCR_AVAILABLE else "pytesseract"),
+        "tesseract_config": TESSERACT_CONFIG
+    }
+
+
+# --- 2. OCR of one image ---
+
+def preprocess_for_ocr(img):
+    """Grayscale, denoise and binarize an image for Tesseract"""
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+    if OPENCV_AVAILABLE:
+        img_array = np.array(img)
+        gray = cv2.cvtColor(img_array, cv2.COLOR_RGB2GRAY)
+        denoised = cv2.medianBlur(gray, 3)
+        clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8,8))
+        enhanced = clahe.apply(denoised)
+        _, thresh = cv2.threshold(enhanced, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        return Image.fromarray(thresh)
+    gray = img.convert('L')
+    enhancer = ImageEnhance.Contrast(gray)
+    enhanced = enhancer.enhance(2.0)
+    return enhanced.filter(ImageFilter.SHARPEN)
+
+
+def ocr_image_text(img):
+    """Local Tesseract OCR of one image, stripped"""
+    processed = preprocess_for_ocr(img)
+    if _tess_api is not None:
+        _tess_api.SetImage(processed)
+        return _tess_api.GetUTF8Text().strip()
+    return pytesseract.image_to_string(processed, config=TESSERACT_CONFIG).strip()
+
+
+def _ocr_with_engine(img):
+    """(text, engine) for one image, naming the engine this process actually used.
+    Errors are re-raised as RuntimeError: some pytesseract exceptions cannot be
+    unpickled, and one failing to cross back from a worker breaks the whole pool."""
+    try:
+        text = ocr_image_text(img)
+    except Exception as e:
+        raise RuntimeError(f"{type(e).__name__}: {e}") from None
+    return text, "tesserocr" if _tess_api is not None else "pytesseract"
+
+
+# --- 3. Worker pool ---
+
+def _init_worker(threads):
+    """Limit OpenMP/OpenCV threads, then load a persistent Tesseract engine if possible"""
+    global _tess_api
+    # Read by Tesseract (and inherited by pytesseract's subprocesses)
+    os.environ["OMP_THREAD_LIMIT"] = str(threads)
+    if OPENCV_AVAILABLE:
+        cv2.setNumThreads(threads)
+    if TESSEROCR_AVAILABLE:
+        try:
+            import tesserocr
+            _tess_api = tesserocr.PyTessBaseAPI(psm=tesserocr.PSM.SINGLE_BLOCK)
+        except Exception as e:
+            print(f"tesserocr unavailable in OCR worker, using pytesseract: {e}")
+            _tess_api = None
+
+
+def get_pool():
+    """Shared OCR pool, created on first use; None when disabled"""
+    if OCR_WORKERS <= 0:
+        return None
+    engine = "tesserocr" if TESSEROCR_AVAILABLE else "pytesseract"
+    return _pools.get(None, OCR_WORKERS, _init_worker, (OCR_THREADS_PER_WORKER,),
+                      detail=f" ({engine}, {OCR_THREADS_PER_WORKER} threads each)")
+
+
+def _ocr_locally(images):
+    results = []
+    for img in images:
+        try:
+            results.append(_ocr_with_engine(img))
+        except Exception as e:
+            results.append((e, None))
+    return results
+
+
+def ocr_images(images):
+    """(OCR text or the exception raised, engine used) for each PIL image, in input order.
+
+    With OCR_WORKERS set, preprocessing and Tesseract run in the worker
+    pool with at most two images per worker in flight, so a large upload
+    cannot queue all of its decoded images at once. Otherwise images are
+    OCR'd one by one in this process. If the pool breaks, images already
+    submitted get the error, the pool is replaced on the next call, and
+    the images not yet submitted are OCR'd in this process.
+    """
+    pool = get_pool()
+    if pool is None:
+        return _ocr_locally(images)
+
+    results = []
+    pending = deque(images)
+    in_flight = deque()
+    try:
+        while pending or in_flight:
+            while pool is not None and pending and len(in_flight) < 2 * OCR_WORKERS:
+                try:
+                    in_flight.append(pool.submit(_ocr_with_engine, pending[0]))
+                except BrokenProcessPool as e:
+                    print(f"OCR pool broken ({e}), OCR'ing the remaining images in-process")
+                    _pools.discard(pool)
+                    pool = None
+                    break
+                pending.popleft()
+            if not in_flight:
+                results.extend(_ocr_locally(pending))
+                break
+            try:
+                results.append(in_flight.popleft().result())
+            except BrokenProcessPool as e:
+                if pool is not None:
+                    print(f"OCR pool broken ({e}), OCR'ing the remaining images in-process")
+                    _pools.discard(pool)
+                    pool = None
+                results.append((e, None))
+            except Exception as e:
+                results.append((e, None))
+    finally:
+        for future in in_flight:
+            future.cancel()
+    return results
+
+
+def shutdown_pool():
+    _pools.shutdown()
@@ -0,0 +1,292 @@
+import io
+import os
+import hashlib
+import tempfile
+from collections import deque
+from concurrent.futures.process import BrokenProcessPool
+
+import fitz  # PyMuPDF
+from PIL import Image
+
+from worker_pools import WorkerPools
+
+# Worker processes for page-range extraction (0 = always extract in the request process)
+PDF_EXTRACTION_WORKERS = int(os.getenv("PDF_EXTRACTION_WORKERS", 0))
+# Documents with at least this many pages are split across the workers
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", 100))
+# Pages per task submitted to a worker; smaller when workers decode images, since a
+# finished range is held in memory (and pickled back) with all of its decoded pixels
+PDF_EXTRACTION_RANGE_PAGES = int(os.getenv("PDF_EXTRACTION_RANGE_PAGES", 16))
+PDF_EXTRACTION_IMAGE_RANGE_PAGES = int(os.getenv("PDF_EXTRACTION_IMAGE_RANGE_PAGES", 2))
+
+_pools = WorkerPools("PDF extraction")
+
+# Set in each worker process: the document it last opened, reused across that document's ranges
+_worker_doc = None  # ((path, mtime_ns, size), fitz document)
+
+
+class ImageRef:
+    """One image occurrence on a page; pixels are only decoded by load().
+    Images extracted by a worker process arrive already decoded."""
+
+    def __init__(self, doc, xref, page, index, image=None):
+        self._doc = doc
+        self.xref = xref
+        self.page = page
+        self.index = index
+        self._image = image
+
+    def load(self):
+        """Decode the image as a PIL image (non-gray/RGB colorspaces converted to RGB, alpha dropped)"""
+        if self._image is not None:
+            return self._image
+        if self._doc is None:
+            raise ValueError("image was not decoded by the extraction worker")
+        pix = fitz.Pixmap(self._doc, self.xref)
+        # CMYK, Separation, ICC-based etc. cannot be written as PNM directly
+        if pix.colorspace is None or pix.colorspace.name not in (fitz.csGRAY.name, fitz.csRGB.name):
+            pix = fitz.Pixmap(fitz.csRGB, pix)
+        if pix.alpha:
+            pix = fitz.Pixmap(pix, 0)
+        return Image.open(io.BytesIO(pix.tobytes("ppm")))
+
+    def info(self):
+        """Image record in the format used by OCR and captioning, or None if it cannot be decoded"""
+        try:
+            image = self.load()
+        except Exception as e:
+            print(f"Error extracting image {self.index} from page {self.page}: {e}")
+            return None
+        return {
+            'page': self.page,
+            'index': self.index,
+            'xref': self.xref,
+            'image': image,
+            'size': image.size,
+            'format': image.format or 'Unknown'
+        }
+
+
+def image_content_hash(image):
+    """Hash of decoded pixels, so the same picture stored under two xrefs matches"""
+    digest = hashlib.sha256(f"{image.mode}:{image.size}".encode())
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+
+class ImageDeduplicator:
+    """Resolves a document's image occurrences to unique images.
+
+    A reused image (logo, header banner, watermark) has one xref that
+    appears on many pages; an xref seen before resolves without decoding.
+    A new xref is decoded and matched by content hash, which catches the
+    same picture embedded more than once. Use one instance per document.
+    """
+
+    def __init__(self):
+        self._keys = {}  # xref -> content hash
+        self._seen = set()
+
+    def resolve(self, ref):
+        """(key, info, is_new) for an occurrence. info is the decoded image record
+        when the xref is new, else None; key is None if the image cannot be decoded."""
+        if ref.xref in self._keys:
+            return self._keys[ref.xref], None, False
+        info = ref.info()
+        if info is None:
+            return None, None, False
+        key = image_content_hash(info['image'])
+        info['content_hash'] = key
+        self._keys[ref.xref] = key
+        is_new = key not in self._seen
+        self._seen.add(key)
+        return key, info, is_new
+
+
+class PageRecord:
+    """Text and image references of one page.
+
+    char_start/char_end locate the page text in the document text, which is
+    the page texts joined with newlines (see join_page_text).
+    """
+
+    def __init__(self, page, text, char_start, images):
+        self.page = page
+        self.text = text
+        self.char_start = char_start
+        self.char_end = char_start + len(text)
+        self.images = images
+
+
+def _open(source):
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return fitz.open(stream=source, filetype="pdf")
+    return fitz.open(source)
+
+
+def iter_pages(source, with_images=True, decode_images=True):
+    """Yield a PageRecord per page of a PDF path or byte string, one page at a time.
+
+    Image references can be loaded while the generator is open. Consumers
+    decode, process and drop images page by page, so peak memory is bounded
+    by one page's images rather than the whole document's.
+
+    Documents of PDF_PARALLEL_MIN_PAGES or more are extracted by the worker
+    pool when PDF_EXTRACTION_WORKERS is set. Workers decode images up front
+    when decode_images is true; otherwise their image references only carry
+    xref and position. Workers decode an xref once per range, so repeated
+    occurrences must be resolved through an ImageDeduplicator.
+    """
+    doc = _open(source)
+    try:
+        if PDF_EXTRACTION_WORKERS > 0 and doc.page_count >= PDF_PARALLEL_MIN_PAGES:
+            page_count = doc.page_count
+            doc.close()
+            doc = None
+            yield from _iter_pages_parallel(source, page_count, with_images, decode_images)
+            return
+
+        offset = 0
+        for page_num, page in enumerate(doc):
+            text = page.get_text()
+            images = []
+            if with_images:
+                images = [ImageRef(doc, img[0], page_num + 1, img_index)
+                          for img_index, img in enumerate(page.get_images())]
+            yield PageRecord(page_num + 1, text, offset, images)
+            offset += len(text) + 1
+    finally:
+        if doc is not None:
+            doc.close()
+
+
+# --- Parallel page-range extraction ---
+
+def get_pool():
+    """Shared extraction pool, created on first use; None when disabled"""
+    if PDF_EXTRACTION_WORKERS <= 0:
+        return None
+    return _pools.get(None, PDF_EXTRACTION_WORKERS)
+
+
+def _read_range(doc, start, stop, with_images, decode_images):
+    """(page, text, [(xref, index, image or None)]) for pages start..stop-1.
+    Each xref is decoded once per range; repeats carry no pixels."""
+    pages = []
+    decoded = set()
+    for page_num in range(start, stop):
+        page = doc[page_num]
+        images = []
+        if with_images:
+            for img_index, img in enumerate(page.get_images()):
+                ref = ImageRef(doc, img[0], page_num + 1, img_index)
+                image = None
+                if decode_images and ref.xref not in decoded:
+                    try:
+                        image = ref.load()
+                        image.load()  # detach pixels from the PPM buffer before pickling
+                    except Exception as e:
+                        print(f"Error extracting image {img_index} from page {page_num + 1}: {e}")
+                        continue
+                    decoded.add(ref.xref)
+                images.append((ref.xref, img_index, image))
+        pages.append((page_num + 1, page.get_text(), images))
+    return pages
+
+
+def _extract_range(path, start, stop, with_images, decode_images):
+    """Worker: page records of one range. The document is opened from the shared
+    path once per worker and kept open for the rest of that document's ranges."""
+    global _worker_doc
+    stat = os.stat(path)
+    key = (path, stat.st_mtime_ns, stat.st_size)
+    if _worker_doc is None or _worker_doc[0] != key:
+        if _worker_doc is not None:
+            _worker_doc[1].close()
+            _worker_doc = None
+        _worker_doc = (key, fitz.open(path))
+    return _read_range(_worker_doc[1], start, stop, with_images, decode_images)
+
+
+def _extract_range_locally(path, start, stop, with_images, decode_images):
+    """Fallback for a range whose worker failed"""
+    doc = fitz.open(path)
+    try:
+        return _read_range(doc, start, stop, with_images, decode_images)
+    finally:
+        doc.close()
+
+
+def _iter_pages_parallel(source, page_count, with_images, decode_images):
+    """Page records in page order from ranges extracted by the pool.
+
+    Workers open the document from a file path: PDF bytes are written once to
+    a private temporary file (removed afterwards) rather than pickled into
+    every task. Without image decoding two ranges per worker are in flight;
+    with it, one range of PDF_EXTRACTION_IMAGE_RANGE_PAGES pages per worker,
+    so decoded pixels held at once are bounded by workers x that many pages.
+    A range whose worker fails is extracted in this process instead, and a
+    broken pool is replaced. Closing the generator cancels queued ranges.
+    """
+    pool = get_pool()
+    temp_path = None
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        # NamedTemporaryFile is created readable by this user only
+        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as temp_pdf:
+            temp_pdf.write(source)
+            temp_path = temp_pdf.name
+        source = temp_path
+
+    range_pages = PDF_EXTRACTION_IMAGE_RANGE_PAGES if (with_images and decode_images) else PDF_EXTRACTION_RANGE_PAGES
+    max_in_flight = PDF_EXTRACTION_WORKERS if (with_images and decode_images) else 2 * PDF_EXTRACTION_WORKERS
+    ranges = deque((start, min(start + range_pages, page_count))
+                   for start in range(0, page_count, range_pages))
+    print(f"Extracting {page_count} pages in {len(ranges)} ranges across {PDF_EXTRACTION_WORKERS} workers")
+
+    in_flight = deque()  # ((start, stop), future or None when submission failed)
+    try:
+        offset = 0
+        while ranges or in_flight:
+            while ranges and len(in_flight) < max_in_flight:
+                page_range = ranges.popleft()
+                try:
+                    future = pool.submit(_extract_range, source, *page_range, with_images, decode_images)
+                except Exception as e:
+                    print(f"Could not submit pages {page_range[0] + 1}-{page_range[1]} to the extraction pool: {e}")
+                    future = None
+                in_flight.append((page_range, future))
+
+            page_range, future = in_flight.popleft()
+            try:
+                if future is None:
+                    raise RuntimeError("range was not submitted")
+                pages = future.result()
+            except Exception as e:
+                if isinstance(e, BrokenProcessPool):
+                    _pools.discard(pool)
+                print(f"Extraction worker failed on pages {page_range[0] + 1}-{page_range[1]} ({e}), "
+                      f"extracting them in-process")
+                pages = _extract_range_locally(source, *page_range, with_images, decode_images)
+
+            for page, text, images in pages:
+                refs = [ImageRef(None, xref, page, index, image) for xref, index, image in images]
+                yield PageRecord(page, text, offset, refs)
+                offset += len(text) + 1
+    finally:
+        for _, future in in_flight:
+            if future is not None:
+                future.cancel()
+        if temp_path is not None:
+            try:
+                os.unlink(temp_path)
+            except Exception as e:
+                print(f"Warning: Could not delete temporary file: {e}")
+
+
+def shutdown_pool():
+    _pools.shutdown()
+
+
+def join_page_text(records_or_texts):
+    """Document text for page records (or page texts), matching PageRecord offsets"""
+    return "\n".join(r if isinstance(r, str) else r.text for r in records_or_texts)
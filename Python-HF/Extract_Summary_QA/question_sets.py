@@ -0,0 +1,108 @@
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+
+from questions import THESIS_QUESTIONS
+from salience import tokenize_for_ranking
+
+DEFAULT_QUESTION_SET = "thesis"
+# Custom (per-request) question sets kept in memory, keyed by content hash
+QUESTION_SET_CACHE_SIZE = int(os.getenv("QUESTION_SET_CACHE_SIZE", 64))
+
+
+def question_set_hash(questions):
+    """Content hash of an ordered list of questions"""
+    return hashlib.sha256(json.dumps(list(questions)).encode()).hexdigest()[:16]
+
+
+class QuestionSet:
+    """An ordered set of questions with per-model preprocessing computed once.
+
+    Ranking terms, model token counts and embeddings are computed on first
+    use for each stop word list / tokenizer / embedding model and then
+    reused by every request that asks the same questions.
+    """
+
+    def __init__(self, name, questions):
+        self.name = name
+        self.questions = tuple(questions)
+        self.content_hash = question_set_hash(self.questions)
+        self._ranking_terms = {}  # stop words -> [set of terms]
+        self._token_counts = {}  # tokenizer name -> [int]
+        self._embeddings = {}  # embedding model name -> array (questions x dim)
+        self._lock = threading.Lock()
+
+    def ranking_terms(self, stop_words=None):
+        """Content terms of each question, filtered like the passages and sentences they are matched against"""
+        key = frozenset(stop_words or ())
+        with self._lock:
+            if key not in self._ranking_terms:
+                self._ranking_terms[key] = [set(tokenize_for_ranking(q, key)) for q in self.questions]
+            return self._ranking_terms[key]
+
+    def token_counts(self, tokenizer):
+        key = getattr(tokenizer, 'name_or_path', None)
+        with self._lock:
+            if key not in self._token_counts:
+                encoded = tokenizer(list(self.questions), add_special_tokens=False)["input_ids"]
+                self._token_counts[key] = [len(ids) for ids in encoded]
+            return self._token_counts[key]
+
+    def embeddings(self, embedder, model_name, encode):
+        """Question embeddings for an embedding model; encode(embedder, texts) computes them once"""
+        if embedder is None:
+            return None
+        with self._lock:
+            if model_name not in self._embeddings:
+                self._embeddings[model_name] = encode(embedder, self.questions)
+            return self._embeddings[model_name]
+
+
+class QuestionSetRegistry:
+    """Named question sets plus an LRU of custom sets supplied with requests"""
+
+    def __init__(self, max_custom=QUESTION_SET_CACHE_SIZE):
+        self.max_custom = max_custom
+        self._named = {}
+        self._by_hash = {}  # content hash -> named set
+        self._custom = OrderedDict()  # content hash -> custom set
+        self._lock = threading.Lock()
+
+    def register(self, name, questions):
+        question_set = QuestionSet(name, questions)
+        with self._lock:
+            self._named[name] = question_set
+            self._by_hash[question_set.content_hash] = question_set
+        return question_set
+
+    def names(self):
+        with self._lock:
+            return list(self._named)
+
+    def resolve(self, questions=None, name=None):
+        """Question set for explicit questions, else for a name, else the default set"""
+        if questions:
+            content_hash = question_set_hash(questions)
+            with self._lock:
+                if content_hash in self._by_hash:
+                    return self._by_hash[content_hash]
+                if content_hash in self._custom:
+                    self._custom.move_to_end(content_hash)
+                    return self._custom[content_hash]
+                question_set = QuestionSet(f"custom-{content_hash}", questions)
+                self._custom[content_hash] = question_set
+                while len(self._custom) > self.max_custom:
+                    self._custom.popitem(last=False)
+                return question_set
+
+        name = name or DEFAULT_QUESTION_SET
+        with self._lock:
+            if name not in self._named:
+                raise ValueError(f"Unknown question set '{name}'. Available: {', '.join(self._named)}")
+            return self._named[name]
+
+
+question_set_registry = QuestionSetRegistry()
+question_set_registry.register(DEFAULT_QUESTION_SET, THESIS_QUESTIONS)
@@ -0,0 +1,178 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+# --- 1. Configuration ---
+
+RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+RESULT_CACHE_DIR = os.getenv("RESULT_CACHE_DIR", "/app/.cache/results")
+RESULT_CACHE_TTL_S = int(os.getenv("RESULT_CACHE_TTL_S", 7 * 24 * 3600))
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", 256))  # in-memory tier
+RESULT_CACHE_MAX_DISK_MB = int(os.getenv("RESULT_CACHE_MAX_DISK_MB", 512))  # on-disk tier
+# Seconds between full scans of a namespace directory for expired entries and writes by
+# other processes; between scans the budget is checked against a running size estimate
+RESULT_CACHE_SWEEP_INTERVAL_S = int(os.getenv("RESULT_CACHE_SWEEP_INTERVAL_S", 300))
+# Share of the disk budget left after eviction, so the next scan is not triggered by the next write
+RESULT_CACHE_EVICT_TO = float(os.getenv("RESULT_CACHE_EVICT_TO", 0.9))
+
+
+def make_cache_key(**parts):
+    """Stable SHA-256 key over JSON-serialisable key parts"""
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+# --- 2. Two-tier cache ---
+
+class ResultCache:
+    """In-memory LRU tier in front of an on-disk tier, both with TTL.
+
+    Disk entries are written through a SecureFileHandler and only when it
+    has an encryption password; callers without one use the memory tier
+    only. An entry written under one password cannot be decrypted under
+    another, and that case counts as a miss in both tiers: memory entries
+    are kept per encryption key. Entries expire ttl_s after they were
+    written; reads refresh the file's mtime, which orders disk eviction only.
+    """
+
+    def __init__(self, namespace, directory=RESULT_CACHE_DIR, ttl_s=RESULT_CACHE_TTL_S,
+                 max_entries=RESULT_CACHE_MAX_ENTRIES, max_disk_mb=RESULT_CACHE_MAX_DISK_MB):
+        self.namespace = namespace
+        self.directory = os.path.join(directory, namespace)
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        self.max_disk_bytes = max_disk_mb * 1024 * 1024
+        self._memory = OrderedDict()  # (scope, key) -> (expires_at, json_text)
+        self._lock = threading.Lock()
+        self._disk_bytes = None  # size of the disk tier at the last scan plus writes since; None = unknown
+        self._next_sweep = 0.0
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+        except Exception as e:
+            print(f"Warning: Result cache directory unavailable ({e}), using memory tier only")
+            self.directory = None
+
+    def get(self, key, secure_handler=None):
+        """Cached value for key, or None on miss/expiry"""
+        now = time.time()
+        memory_key = self._memory_key(key, secure_handler)
+        with self._lock:
+            entry = self._memory.get(memory_key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._memory.move_to_end(memory_key)
+                    return json.loads(entry[1])
+                del self._memory[memory_key]
+
+        if not self._uses_disk(secure_handler):
+            return None
+
+        path = self._path(key)
+        stored = path + '.enc'
+        if not os.path.exists(stored):
+            return None
+        try:
+            entry = secure_handler.secure_load(path)
+        except Exception:
+            # Written under a different password (or corrupt)
+            return None
+        if not isinstance(entry, dict) or "created_at" not in entry:
+            return None
+        if entry["created_at"] + self.ttl_s <= now:
+            self._delete(path, secure_handler)
+            return None
+
+        os.utime(stored)  # LRU order on disk follows last access
+        self._remember(key, entry["value"], entry["created_at"], secure_handler)
+        return entry["value"]
+
+    def put(self, key, value, secure_handler=None):
+        """Store value in memory and, when the handler encrypts, on disk"""
+        now = time.time()
+        self._remember(key, value, now, secure_handler)
+        if not self._uses_disk(secure_handler):
+            return
+        path = self._path(key)
+        secure_handler.secure_save({"created_at": now, "value": value}, path)
+        if self._needs_sweep(path):
+            remaining = self._enforce_disk_budget(secure_handler)
+            with self._lock:
+                self._disk_bytes = remaining
+
+    def _uses_disk(self, secure_handler):
+        """Only encrypted entries are written: a handler without a password would store plaintext"""
+        return bool(self.directory) and getattr(secure_handler, 'fernet', None) is not None
+
+    @staticmethod
+    def _memory_key(key, secure_handler):
+        """Memory entries are scoped to the encryption key, mirroring the disk tier"""
+        fernet_key = getattr(secure_handler, 'key', None)
+        scope = hashlib.sha256(fernet_key).hexdigest()[:16] if fernet_key else None
+        return (scope, key)
+
+    def _remember(self, key, value, created_at, secure_handler=None):
+        memory_key = self._memory_key(key, secure_handler)
+        with self._lock:
+            self._memory[memory_key] = (created_at + self.ttl_s, json.dumps(value))
+            self._memory.move_to_end(memory_key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key)
+
+    def _delete(self, path, secure_handler):
+        try:
+            secure_handler.secure_delete(path)
+        except Exception as e:
+            print(f"Warning: Could not delete cache entry {os.path.basename(path)}: {e}")
+
+    def _needs_sweep(self, path):
+        """Count a write against the size estimate; True when the directory should be scanned.
+        Overwrites are counted twice, which only makes the next scan come sooner."""
+        try:
+            written = os.path.getsize(path + '.enc')
+        except OSError:
+            written = 0
+        now = time.time()
+        with self._lock:
+            if self._disk_bytes is not None:
+                self._disk_bytes += written
+            if self._disk_bytes is not None and self._disk_bytes <= self.max_disk_bytes and now < self._next_sweep:
+                return False
+            self._next_sweep = now + RESULT_CACHE_SWEEP_INTERVAL_S
+            return True
+
+    def _enforce_disk_budget(self, secure_handler):
+        """Remove entries unread for the TTL, then least recently used ones until a full tier is
+        back under RESULT_CACHE_EVICT_TO of its size budget. Entries that are read but older than
+        the TTL are removed by get.
+        Returns the bytes left on disk, or None if the scan failed."""
+        try:
+            entries = []
+            now = time.time()
+            for name in os.listdir(self.directory):
+                full = os.path.join(self.directory, name)
+                stat = os.stat(full)
+                if stat.st_mtime + self.ttl_s <= now:
+                    self._delete(full[:-4] if name.endswith('.enc') else full, secure_handler)
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, full, name))
+
+            total = sum(size for _, size, _, _ in entries)
+            target = self.max_disk_bytes if total <= self.max_disk_bytes else self.max_disk_bytes * RESULT_CACHE_EVICT_TO
+            for _, size, full, name in sorted(entries):
+                if total <= target:
+                    break
+                self._delete(full[:-4] if name.endswith('.enc') else full, secure_handler)
+                total -= size
+            return total
+        except Exception as e:
+            print(f"Warning: Result cache eviction failed: {e}")
+            return None
+
+
+result_cache = ResultCache("reports")
@@ -0,0 +1,212 @@
+import os
+import json
+import hashlib
+import threading
+from collections import Counter, OrderedDict
+
+import numpy as np
+from scipy import sparse
+
+from chunking import chunk_by_tokens, count_tokens
+from salience import tokenize_for_ranking
+from model_registry import model_registry, EMBEDDING_MODEL_NAME
+from embedding_store import embedding_store
+
+# --- 1. Configuration ---
+
+# Passage size in model tokens, and passages retrieved per question
+RETRIEVAL_PASSAGE_TOKENS = int(os.getenv("RETRIEVAL_PASSAGE_TOKENS", 128))
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", 3))
+# Weight of the normalized BM25 score; the rest goes to embedding cosine similarity
+RETRIEVAL_BM25_WEIGHT = float(os.getenv("RETRIEVAL_BM25_WEIGHT", 0.5))
+# Number of per-document indexes kept in memory
+RETRIEVAL_INDEX_CACHE_SIZE = int(os.getenv("RETRIEVAL_INDEX_CACHE_SIZE", 16))
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", 32))
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+
+def load_embedder():
+    """Shared embedding model, or None to rank with BM25 alone"""
+    try:
+        return model_registry.get_embedder()
+    except Exception as e:
+        print(f"Embedding model unavailable, retrieval uses BM25 only: {e}")
+        return None
+
+
+def embed_texts(embedder, texts):
+    """Unit-length float32 embeddings for a list of texts"""
+    return embedder.encode(list(texts), batch_size=EMBEDDING_BATCH_SIZE, convert_to_numpy=True,
+                           normalize_embeddings=True).astype(np.float32)
+
+
+# --- 2. Passage index ---
+
+class PassageIndex:
+    """Passages of one document with a BM25 weight matrix and unit-length embeddings.
+
+    bm25_weights is a sparse passages x vocabulary matrix holding the full
+    BM25 term weight of every (passage, term) pair, so scoring a batch of
+    questions is one sparse-dense product; embedding similarity is one dense
+    product. embeddings may be a read-only float16 memmap from the embedding
+    store, and is None when no embedding model is available.
+    """
+
+    def __init__(self, passages, token_counts, vocabulary, bm25_weights, embeddings=None, stop_words=None):
+        self.passages = passages
+        self.token_counts = np.asarray(token_counts)
+        self.vocabulary = vocabulary
+        self.bm25_weights = bm25_weights
+        self.embeddings = embeddings
+        self.stop_words = stop_words
+
+    @classmethod
+    def build(cls, text, tokenizer, stop_words=None, embedder=None, passage_tokens=RETRIEVAL_PASSAGE_TOKENS):
+        """Chunk, embed and index a document"""
+        passages = chunk_by_tokens(text, tokenizer, max_tokens=passage_tokens, reserve_tokens=0)
+        token_counts = count_tokens(tokenizer, passages)
+        embeddings = embed_texts(embedder, passages) if embedder is not None and passages else None
+        return cls.from_passages(passages, token_counts, stop_words, embeddings)
+
+    @classmethod
+    def from_passages(cls, passages, token_counts, stop_words=None, embeddings=None):
+        """Index already chunked (and optionally embedded) passages; only BM25 is computed"""
+        tokenized = [tokenize_for_ranking(p, stop_words) for p in passages]
+        vocabulary = {}
+        rows, cols, tfs = [], [], []
+        for row, tokens in enumerate(tokenized):
+            for term, tf in Counter(tokens).items():
+                rows.append(row)
+                cols.append(vocabulary.setdefault(term, len(vocabulary)))
+                tfs.append(tf)
+
+        n_passages = len(passages)
+        tf_matrix = sparse.csr_matrix(
+            (np.asarray(tfs, dtype=np.float32), (rows, cols)),
+            shape=(n_passages, max(len(vocabulary), 1))
+        )
+        lengths = np.array([len(tokens) for tokens in tokenized], dtype=np.float32)
+        avg_length = lengths.mean() if n_passages and lengths.mean() > 0 else 1.0
+        df = np.bincount(tf_matrix.indices, minlength=tf_matrix.shape[1]).astype(np.float32)
+        idf = np.log((n_passages - df + 0.5) / (df + 0.5) + 1.0)
+
+        # BM25 saturation and length normalization applied to every stored entry at once
+        row_of_entry = np.repeat(np.arange(n_passages), np.diff(tf_matrix.indptr))
+        tf = tf_matrix.data
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[row_of_entry] / avg_length)
+        tf_matrix.data = idf[tf_matrix.indices] * tf * (BM25_K1 + 1) / (tf + norm)
+
+        return cls(passages, token_counts, vocabulary, tf_matrix, embeddings, stop_words)
+
+    def score(self, questions, embedder=None, question_set=None):
+        """Hybrid relevance of every passage for every question (questions x passages).
+
+        With a QuestionSet, its precomputed ranking terms and cached
+        embeddings are used instead of processing the questions again.
+        """
+        if question_set is not None:
+            question_terms = question_set.ranking_terms(self.stop_words)
+        else:
+            question_terms = [set(tokenize_for_ranking(q, self.stop_words)) for q in questions]
+        rows, cols = [], []
+        for row, terms in enumerate(question_terms):
+            for term in terms:
+                col = self.vocabulary.get(term)
+                if col is not None:
+                    rows.append(row)
+                    cols.append(col)
+        query = sparse.csr_matrix(
+            (np.ones(len(rows), dtype=np.float32), (rows, cols)),
+            shape=(len(questions), self.bm25_weights.shape[1])
+        )
+        bm25 = np.asarray((query @ self.bm25_weights.T).todense(), dtype=np.float32)
+        peak = bm25.max(axis=1, keepdims=True)
+        bm25 = np.divide(bm25, peak, out=np.zeros_like(bm25), where=peak > 0)
+
+        if self.embeddings is None or embedder is None:
+            return bm25
+        if question_set is not None:
+            question_embeddings = question_set.embeddings(embedder, EMBEDDING_MODEL_NAME, embed_texts)
+        else:
+            question_embeddings = embed_texts(embedder, questions)
+        similarity = question_embeddings @ self.embeddings.T
+        return RETRIEVAL_BM25_WEIGHT * bm25 + (1 - RETRIEVAL_BM25_WEIGHT) * similarity
+
+    def retrieve(self, questions, token_budget, top_k=RETRIEVAL_TOP_K, embedder=None, question_set=None):
+        """Context for each question: its best passages within token_budget, in document order.
+        token_budget is one number for all questions or one per question."""
+        if not self.passages:
+            return ["" for _ in questions]
+        scores = self.score(questions, embedder, question_set)
+        ranking = np.argsort(-scores, axis=1)
+        budgets = np.broadcast_to(np.asarray(token_budget), (len(questions),))
+
+        contexts = []
+        for order, budget in zip(ranking, budgets):
+            chosen = []
+            used = 0
+            for i in order:
+                if len(chosen) >= top_k:
+                    break
+                if used + self.token_counts[i] > budget:
+                    continue
+                chosen.append(i)
+                used += self.token_counts[i]
+            contexts.append(" ".join(self.passages[i] for i in sorted(chosen)))
+        return contexts
+
+
+def prepare_question_set(question_set):
+    """Embed a question set ahead of its first request, if the embedding model is loaded"""
+    if model_registry.is_loaded("embedder", EMBEDDING_MODEL_NAME):
+        question_set.embeddings(model_registry.get_embedder(), EMBEDDING_MODEL_NAME, embed_texts)
+
+
+# --- 3. Per-document cache ---
+
+_indexes = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def get_index(text, tokenizer, stop_words=None, secure_handler=None):
+    """Passage index for a document, built once per document hash and tokenizer.
+
+    The hash covers the prepared text (page text plus any OCR text), so the
+    same PDF processed with and without OCR gets separate indexes. Passages
+    and embeddings are persisted in the embedding store when a
+    SecureFileHandler is given, so a document seen before is never re-embedded.
+    Returns (index, embedder); embedder is None when retrieval is BM25 only.
+    """
+    doc_hash = hashlib.sha256(text.encode()).hexdigest()
+    key = (doc_hash, getattr(tokenizer, 'name_or_path', None))
+    embedder = load_embedder()
+    with _indexes_lock:
+        if key in _indexes:
+            _indexes.move_to_end(key)
+            return _indexes[key], embedder
+
+    store_key = hashlib.sha256(json.dumps({
+        "document_hash": doc_hash,
+        "tokenizer": key[1],
+        "passage_tokens": RETRIEVAL_PASSAGE_TOKENS,
+        "embedding_model": EMBEDDING_MODEL_NAME
+    }, sort_keys=True).encode()).hexdigest()
+    stored = embedding_store.load(store_key, secure_handler, embedding_model=EMBEDDING_MODEL_NAME)
+    if stored is not None:
+        index = PassageIndex.from_passages(stored.passages, stored.token_counts, stop_words, stored.embeddings)
+        print(f"Loaded retrieval index from embedding store: {len(index.passages)} passages")
+    else:
+        index = PassageIndex.build(text, tokenizer, stop_words, embedder)
+        print(f"Built retrieval index: {len(index.passages)} passages, {len(index.vocabulary)} terms")
+        if index.embeddings is not None:
+            embedding_store.save(store_key, index.passages, index.token_counts, index.embeddings, secure_handler,
+                                 document_hash=doc_hash[:16], embedding_model=EMBEDDING_MODEL_NAME,
+                                 tokenizer=key[1], passage_tokens=RETRIEVAL_PASSAGE_TOKENS)
+
+    with _indexes_lock:
+        _indexes[key] = index
+        while len(_indexes) > RETRIEVAL_INDEX_CACHE_SIZE:
+            _indexes.popitem(last=False)
+    return index, embedder
@@ -0,0 +1,47 @@
+import re
+from collections import Counter
+
+from rank_bm25 import BM25Okapi
+
+# Number of most frequent document terms that make up the centroid query
+CENTROID_TERMS = 50
+
+
+def tokenize_for_ranking(text, stop_words=None):
+    """Lowercase word tokens for lexical scoring, without stop words"""
+    stop_words = stop_words or set()
+    return [w for w in re.findall(r'\b[a-z]{3,}\b', text.lower()) if w not in stop_words]
+
+
+def rank_chunks_by_salience(chunks, stop_words=None, centroid_terms=CENTROID_TERMS):
+    """BM25 score of every chunk against the document centroid.
+
+    The centroid is the set of most frequent content terms across the whole
+    document, so chunks that cover the document's main topics rank highest.
+    """
+    tokenized = [tokenize_for_ranking(chunk, stop_words) for chunk in chunks]
+    term_freq = Counter(term for tokens in tokenized for term in tokens)
+    query = [term for term, _ in term_freq.most_common(centroid_terms)]
+    if not query:
+        return [0.0] * len(chunks)
+    # BM25Okapi divides by the average document length, so guard empty chunks
+    bm25 = BM25Okapi([tokens or ["_"] for tokens in tokenized])
+    return list(bm25.get_scores(query))
+
+
+def select_salient_chunks(chunks, token_counts, token_budget, top_k=None, stop_words=None):
+    """Indices of the highest-scoring chunks that fit in token_budget, in document order"""
+    scores = rank_chunks_by_salience(chunks, stop_words)
+    ranked = sorted(range(len(chunks)), key=lambda i: scores[i], reverse=True)
+
+    selected = []
+    used = 0
+    for i in ranked:
+        if top_k is not None and len(selected) >= top_k:
+            break
+        if used + token_counts[i] > token_budget:
+            continue
+        selected.append(i)
+        used += token_counts[i]
+
+    return sorted(selected)
@@ -0,0 +1,53 @@
+import os
+
+import numpy as np
+
+from chunking import split_sentences
+from salience import tokenize_for_ranking
+
+# Weight of question-term overlap; the rest goes to embedding cosine similarity
+SPAN_QA_LEXICAL_WEIGHT = float(os.getenv("SPAN_QA_LEXICAL_WEIGHT", 0.4))
+# Spans shorter than this are extended with the following sentence
+SPAN_QA_MIN_CHARS = int(os.getenv("SPAN_QA_MIN_CHARS", 60))
+SPAN_QA_MAX_CHARS = int(os.getenv("SPAN_QA_MAX_CHARS", 400))
+
+
+def answer_spans(contexts, question_terms, question_embeddings=None, embedder=None, encode=None, stop_words=None):
+    """Best answer span and confidence for each question, taken from that question's context.
+
+    Every sentence of a context is a candidate span. Candidates are scored by
+    the share of question terms they contain and, when an embedding model is
+    available, by cosine similarity to the question; all distinct candidate
+    sentences are embedded in a single call. Returns [(span, confidence)],
+    with confidence in [0, 1].
+    """
+    candidates = [split_sentences(context) for context in contexts]
+    unique = list(dict.fromkeys(sentence for sentences in candidates for sentence in sentences))
+    position = {sentence: i for i, sentence in enumerate(unique)}
+    sentence_terms = [set(tokenize_for_ranking(sentence, stop_words)) for sentence in unique]
+
+    sentence_embeddings = None
+    if embedder is not None and question_embeddings is not None and unique:
+        sentence_embeddings = encode(embedder, unique)
+
+    results = []
+    for q, sentences in enumerate(candidates):
+        if not sentences:
+            results.append(("", 0.0))
+            continue
+        rows = [position[sentence] for sentence in sentences]
+        terms = question_terms[q]
+        lexical = np.array([len(terms & sentence_terms[r]) / len(terms) if terms else 0.0 for r in rows],
+                           dtype=np.float32)
+        if sentence_embeddings is not None:
+            semantic = np.clip(sentence_embeddings[rows] @ question_embeddings[q], 0.0, 1.0)
+            scores = SPAN_QA_LEXICAL_WEIGHT * lexical + (1 - SPAN_QA_LEXICAL_WEIGHT) * semantic
+        else:
+            scores = lexical
+
+        best = int(np.argmax(scores))
+        span = sentences[best]
+        if len(span) < SPAN_QA_MIN_CHARS and best + 1 < len(sentences):
+            span = f"{span} {sentences[best + 1]}"
+        results.append((span[:SPAN_QA_MAX_CHARS], round(float(scores[best]), 3)))
+    return results
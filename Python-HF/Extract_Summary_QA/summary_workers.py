@@ -0,0 +1,78 @@
+import os
+from concurrent.futures.process import BrokenProcessPool
+
+import torch
+
+from model_registry import model_registry
+from worker_pools import WorkerPools
+
+# Worker processes for the map and reduce stages (0 = summarize in the request process)
+SUMMARY_WORKERS = int(os.getenv("SUMMARY_WORKERS", 0))
+# Models with a live worker pool; each pool holds its own copy of the model outside the
+# registry's memory budget, so the least recently used pool is shut down beyond this
+SUMMARY_WORKER_POOLS = max(1, int(os.getenv("SUMMARY_WORKER_POOLS", 1)))
+
+_pools = WorkerPools("summary", max_pools=SUMMARY_WORKER_POOLS)  # keyed by (model, precision, backend)
+
+# Set in each worker process by _init_worker
+_worker_bundle = None
+
+
+def _init_worker(model_name, precision, backend, torch_threads):
+    """Load the model once per worker process and split cores between workers"""
+    global _worker_bundle
+    torch.set_num_threads(torch_threads)
+    _worker_bundle = model_registry.get_seq2seq(model_name, precision, backend)
+
+
+def _summarize_in_worker(texts, gen_kwargs):
+    outputs = _worker_bundle.summarizer(texts, batch_size=len(texts), **gen_kwargs)
+    return [output['summary_text'] for output in outputs]
+
+
+def get_pool(model_name, precision, backend):
+    """Shared worker pool for a model, created on first use; None when disabled.
+    At most SUMMARY_WORKER_POOLS pools are alive, and a broken pool is replaced."""
+    if SUMMARY_WORKERS <= 0:
+        return None
+    # Cores are split across every pool that can be alive at once
+    torch_threads = max(1, (os.cpu_count() or 1) // (SUMMARY_WORKERS * SUMMARY_WORKER_POOLS))
+    return _pools.get((model_name, precision, backend), SUMMARY_WORKERS, _init_worker,
+                      (model_name, precision, backend, torch_threads),
+                      detail=f" for {model_name} ({torch_threads} threads each)")
+
+
+def summarize_batches(pool, batches, gen_kwargs):
+    """Submit batches to the pool; yields (batch_index, summaries or exception) in batch order.
+    Closing the generator early cancels batches that have not started. If the
+    pool breaks (a worker crashed or failed to load the model), it is discarded
+    and every unfinished batch yields the error, so the caller can retry locally."""
+    futures = []
+    try:
+        for batch in batches:
+            futures.append(pool.submit(_summarize_in_worker, batch, gen_kwargs))
+    except Exception as e:
+        # Broken, or shut down by another request evicting this model's pool
+        if isinstance(e, BrokenProcessPool):
+            _pools.discard(pool)
+        futures.extend(e for _ in range(len(batches) - len(futures)))
+    try:
+        for i, future in enumerate(futures):
+            if isinstance(future, Exception):
+                yield i, future
+                continue
+            try:
+                yield i, future.result()
+            except BrokenProcessPool as e:
+                _pools.discard(pool)
+                yield i, e
+            except Exception as e:
+                yield i, e
+    finally:
+        for future in futures:
+            if not isinstance(future, Exception):
+                future.cancel()
+
+
+def shutdown_pools():
+    _pools.shutdown()
@@ -12,6 +12,9 @@ import torch
 from transformers import T5ForConditionalGeneration, T5Tokenizer, pipeline
 import warnings
 
+from chunking import chunk_by_tokens, model_input_limit
+from retrieval import get_index as get_retrieval_index
+
 warnings.filterwarnings('ignore')
 
 
@@ -132,31 +135,9 @@ class ThesisAnalyzer:
 
         return text.strip()
 
-    def chunk_text(self, text, max_chunk_size=1000):
-        """Split text into chunks for processing with T5"""
-        try:
-            sentences = sent_tokenize(text)
-        except LookupError:
-            print("NLTK punkt tokenizer not found. Using basic sentence splitting...")
-            # Fallback to basic sentence splitting
-            sentences = re.split(r'[.!?]+', text)
-            sentences = [s.strip() for s in sentences if s.strip()]
-
-        chunks = []
-        current_chunk = ""
-
-        for sentence in sentences:
-            if len(current_chunk) + len(sentence) <= max_chunk_size:
-                current_chunk += sentence + " "
-            else:
-                if current_chunk:
-                    chunks.append(current_chunk.strip())
-                current_chunk = sentence + " "
-
-        if current_chunk:
-            chunks.append(current_chunk.strip())
-
-        return chunks
+    def chunk_text(self, text, max_tokens=None, overlap_tokens=0):
+        """Split text into sentence-aligned chunks sized in T5 tokens"""
+        return chunk_by_tokens(text, self.tokenizer, max_tokens=max_tokens, overlap_tokens=overlap_tokens)
 
     def extract_key_sections(self, text):
         """Extract key sections from the thesis"""
@@ -243,7 +224,7 @@ class ThesisAnalyzer:
         try:
             # Preprocess and chunk the text
             clean_text = self.preprocess_text(text)
-            chunks = self.chunk_text(clean_text, max_chunk_size=1000)
+            chunks = self.chunk_text(clean_text, overlap_tokens=32)
 
             print(f"Processing {len(chunks)} text chunks for summarization...")
 
@@ -335,35 +316,27 @@ class ThesisAnalyzer:
         answers = {}
         clean_text = self.preprocess_text(self.thesis_text)
 
-        # Limit text length for processing
-        text_chunks = self.chunk_text(clean_text, max_chunk_size=1500)
+        # Retrieve the most relevant passages from the whole document for every question
+        index, embedder = get_retrieval_index(clean_text, self.tokenizer, self.stop_words)
+        contexts = index.retrieve(questions, model_input_limit(self.tokenizer) - 64, embedder=embedder)
 
-        for question in questions:
+        for question, best_chunk in zip(questions, contexts):
             print(f"Processing question: {question[:50]}...")
 
             try:
-                # Find the most relevant chunk for this question
-                best_chunk = ""
-                best_score = 0
-
                 try:
                     question_words = set(word_tokenize(question.lower()))
                 except LookupError:
                     question_words = set(re.findall(r'\b[a-zA-Z]+\b', question.lower()))
 
-                for chunk in text_chunks[:3]:  # Process first 3 chunks
-                    try:
-                        chunk_words = set(word_tokenize(chunk.lower()))
-                    except LookupError:
-                        chunk_words = set(re.findall(r'\b[a-zA-Z]+\b', chunk.lower()))
-
-                    overlap = len(question_words.intersection(chunk_words))
-                    if overlap > best_score:
-                        best_score = overlap
-                        best_chunk = chunk
+                try:
+                    chunk_words = set(word_tokenize(best_chunk.lower()))
+                except LookupError:
+                    chunk_words = set(re.findall(r'\b[a-zA-Z]+\b', best_chunk.lower()))
+                best_score = len(question_words.intersection(chunk_words))
 
                 # Create T5 prompt for question answering
-                prompt = f"question: {question} context: {best_chunk[:1000]}"
+                prompt = f"question: {question} context: {best_chunk}"
 
                 # Generate answer using T5
                 answer_result = self.qa_pipeline(
@@ -372,7 +345,8 @@ class ThesisAnalyzer:
                     min_length=30,
                     do_sample=True,
                     temperature=0.7,
-                    num_return_sequences=1
+                    num_return_sequences=1,
+                    truncation=True
                 )
 
                 answer = answer_result[0]['generated_text']
@@ -0,0 +1,61 @@
+import threading
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+
+class WorkerPools:
+    """Process pools created on first use and shared by every request, one per key.
+
+    Pools use the spawn start method: the serving process has torch threads
+    running, which fork does not copy safely. A pool whose workers died is
+    replaced on the next get, and beyond max_pools the least recently used
+    pool is shut down.
+    """
+
+    def __init__(self, label, max_pools=1):
+        self.label = label
+        self.max_pools = max_pools
+        self._pools = OrderedDict()  # key -> pool, least recently used first
+        self._lock = threading.Lock()
+
+    def get(self, key, max_workers, initializer=None, initargs=(), detail=""):
+        """Live pool for key; detail is appended to the start-up message"""
+        with self._lock:
+            pool = self._pools.get(key)
+            if pool is not None and getattr(pool, '_broken', False):
+                print(f"{self.label} worker pool is broken, restarting it")
+                del self._pools[key]
+                pool.shutdown(wait=False, cancel_futures=True)
+                pool = None
+            if pool is not None:
+                self._pools.move_to_end(key)
+                return pool
+
+            while len(self._pools) >= self.max_pools:
+                evicted, old_pool = self._pools.popitem(last=False)
+                print(f"Shutting down {self.label} workers for {evicted}")
+                old_pool.shutdown(wait=False, cancel_futures=True)
+            pool = ProcessPoolExecutor(
+                max_workers=max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=initializer,
+                initargs=initargs
+            )
+            self._pools[key] = pool
+            print(f"Started {max_workers} {self.label} workers{detail}")
+            return pool
+
+    def discard(self, pool):
+        """Forget a pool whose workers died so the next get starts a fresh one"""
+        with self._lock:
+            for key, existing in list(self._pools.items()):
+                if existing is pool:
+                    del self._pools[key]
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self):
+        with self._lock:
+            for pool in self._pools.values():
+                pool.shutdown(wait=False, cancel_futures=True)
+            self._pools.clear()